@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the task pipeline on a synthetic Obsidian vault
+"""
+
+import os
+import re
+import sys
+import time
+import json
+import random
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import tasks_parser
+import morning_plan
+
+TASK_TEMPLATES = [
+    'Подготовить справку для Линара #важно 📅 {date}',
+    'Обновить смету ЭКСПО (2ч)',
+    'Созвониться с Никитой до {short}',
+    'Проверить почту (15 мин) #low',
+    'Отправить КП Рязань deadline: {date} #срочно',
+    'Написать документацию по боту (45м) #docs',
+    'Разобрать заметки ⭐',
+    'Купить продукты',
+]
+
+
+def make_task_line(rng: random.Random) -> str:
+    """Random task line in the formats the parser understands"""
+    day = datetime(2026, 1, 1) + timedelta(days=rng.randrange(365))
+    text = rng.choice(TASK_TEMPLATES).format(
+        date=day.strftime('%Y-%m-%d'),
+        short=day.strftime('%d.%m')
+    )
+    return f"- [ ] {text}"
+
+
+def make_synthetic_vault(root: Path, files: int, tasks_per_file: int = 5, seed: int = 42) -> None:
+    """Create a diary-like vault with the given number of notes"""
+    rng = random.Random(seed)
+    diary = root / '1. Дневник'
+    diary.mkdir(parents=True, exist_ok=True)
+    start = datetime(2020, 1, 1)
+
+    for i in range(files):
+        lines = [f"# Заметка {i}", "", "## 🎯 Задачи", ""]
+        for _ in range(tasks_per_file):
+            lines.append(make_task_line(rng))
+            lines.append(f"- [x] Сделано {rng.randrange(1000)}")
+        lines += ["", "## 💡 Заметки", "", "Текст заметки " * 20]
+        name = (start + timedelta(days=i)).strftime('%Y-%m-%d')
+        (diary / f"{name}-{i}.md").write_text('\n'.join(lines), encoding='utf-8')
+
+
+def legacy_task_attributes(text: str) -> tuple:
+    """Attribute extraction as it was before the single-pass scanner (reference)"""
+    text_lower = text.lower()
+    if '#срочно' in text_lower or '#urgent' in text_lower or '❗' in text:
+        priority = 'high'
+    elif '#важно' in text_lower or '#important' in text_lower or '⭐' in text:
+        priority = 'high'
+    elif '#низкий' in text_lower or '#low' in text_lower:
+        priority = 'low'
+    else:
+        priority = 'medium'
+
+    deadline = None
+    match = re.search(r'📅\s*(\d{4}-\d{2}-\d{2})', text)
+    if match:
+        deadline = datetime.strptime(match.group(1), '%Y-%m-%d')
+    else:
+        match = re.search(r'до\s+(\d{1,2})\.(\d{1,2})', text)
+        if match:
+            deadline = datetime(datetime.now().year, int(match.group(2)), int(match.group(1)))
+        else:
+            match = re.search(r'deadline:\s*(\d{4}-\d{2}-\d{2})', text, re.IGNORECASE)
+            if match:
+                deadline = datetime.strptime(match.group(1), '%Y-%m-%d')
+
+    tags = re.findall(r'#(\w+)', text)
+
+    estimate = None
+    match = re.search(r'\((\d+)\s*(?:мин|м|min|m)\)', text, re.IGNORECASE)
+    if match:
+        estimate = int(match.group(1))
+    else:
+        match = re.search(r'\((\d+)\s*(?:ч|ч\.|h)\)', text, re.IGNORECASE)
+        if match:
+            estimate = int(match.group(1)) * 60
+
+    return priority, deadline, tags, estimate
+
+
+def timed(func, *args, **kwargs):
+    """Run func once and return (result, seconds)"""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def bench_scan(args) -> None:
+    """Serial vs parallel cold scan"""
+    with tempfile.TemporaryDirectory() as tmp:
+        vault = Path(tmp)
+        make_synthetic_vault(vault, args.files)
+        sources = ['1. Дневник']
+
+        serial, serial_time = timed(tasks_parser.scan_vault_for_tasks, str(vault), sources, workers=1)
+        parallel, parallel_time = timed(
+            tasks_parser.scan_vault_for_tasks, str(vault), sources, workers=args.workers
+        )
+
+        same = [t.to_dict() for t in serial] == [t.to_dict() for t in parallel]
+        print(f"Files: {args.files}, tasks: {len(serial)}")
+        print(f"  serial:              {serial_time:.2f}s")
+        print(f"  parallel ({args.workers} workers): {parallel_time:.2f}s "
+              f"(x{serial_time / parallel_time:.1f})")
+        print(f"  identical order:     {same}")
+
+
+def bench_tokenizer(args) -> None:
+    """Per-line attribute extraction throughput, legacy vs single-pass scanner"""
+    rng = random.Random(7)
+    lines = [make_task_line(rng)[len('- [ ] '):] for _ in range(args.lines)]
+    lines += [
+        '#Срочно до 5.3 (45 МИН) (2h)', 'Deadline: 2026-03-01 📅 2026-02-01 #lowercase',
+        '#deadline: 2026-01-01', '(1ч.) подо 12.03 #a#b ❗', 'пусто',
+    ]
+
+    mismatches = sum(
+        legacy_task_attributes(line) != tasks_parser.scan_task_attributes(line)
+        for line in lines
+    )
+
+    for name, func in (('legacy', legacy_task_attributes),
+                       ('single-pass', tasks_parser.scan_task_attributes)):
+        _, seconds = timed(lambda: [func(line) for line in lines])
+        print(f"  {name:12} {len(lines) / seconds:12,.0f} lines/s")
+    print(f"  mismatches:  {mismatches}")
+
+
+def bench_topk(args) -> None:
+    """Heap top-K vs full sort, plus a randomized ordering parity check"""
+    rng = random.Random(11)
+    keywords = ['ЭКСПО', 'Рязань', 'Казань']
+    now = datetime(2026, 6, 1, 9, 30)
+
+    for trial in range(args.trials):
+        tasks = [
+            tasks_parser.Task(make_task_line(rng)[len('- [ ] '):], 'synthetic.md', i)
+            for i in range(rng.randrange(0, 200))
+        ]
+        limit = rng.randrange(0, 12)
+        expected = tasks_parser.prioritize_tasks(tasks, keywords, now=now)[:limit]
+        actual = tasks_parser.select_top_tasks(tasks, keywords, limit, now=now)
+        if [id(t) for t in expected] != [id(t) for t in actual]:
+            print(f"  parity FAILED on trial {trial} (limit={limit}, tasks={len(tasks)})")
+            sys.exit(1)
+    print(f"  parity: {args.trials} random trials identical")
+
+    tasks = [
+        tasks_parser.Task(make_task_line(rng)[len('- [ ] '):], 'synthetic.md', i)
+        for i in range(args.tasks)
+    ]
+    _, full = timed(lambda: tasks_parser.prioritize_tasks(tasks, keywords, now=now)[:args.limit])
+    _, heap = timed(tasks_parser.select_top_tasks, tasks, keywords, args.limit, now=now)
+    print(f"  {args.tasks} tasks, top {args.limit}: full sort {full * 1000:.1f}ms, "
+          f"heap {heap * 1000:.1f}ms")
+
+
+def bench_morning(args) -> None:
+    """Task loading in-process vs subprocess, and end-to-end morning_plan.py latency"""
+    with tempfile.TemporaryDirectory() as tmp:
+        vault = Path(tmp) / 'vault'
+        make_synthetic_vault(vault, args.files)
+
+        config = tasks_parser.load_config()
+        config['obsidian']['vault_path'] = str(vault)
+        config['obsidian']['tasks_sources'] = ['1. Дневник']
+        config['cache'] = {'dir': str(Path(tmp) / 'cache')}
+        config_path = Path(tmp) / 'config.json'
+        config_path.write_text(json.dumps(config, ensure_ascii=False), encoding='utf-8')
+
+        # Warm the index so both paths measure the daily (mostly cached) case
+        tasks_parser.collect_tasks(config)
+
+        def best_of(func):
+            return min(timed(func)[1] for _ in range(args.repeat))
+
+        in_process = best_of(lambda: morning_plan.get_tasks(config))
+        spawned = best_of(lambda: morning_plan.get_tasks_subprocess(config_path))
+        script = Path(__file__).parent / 'morning_plan.py'
+        end_to_end = best_of(lambda: subprocess.run(
+            [sys.executable, str(script), '--config', str(config_path)],
+            capture_output=True, check=True
+        ))
+
+        print(f"Files: {args.files} (warm index), best of {args.repeat}")
+        print(f"  get_tasks in-process:  {in_process * 1000:8.1f}ms")
+        print(f"  get_tasks subprocess:  {spawned * 1000:8.1f}ms")
+        print(f"  morning_plan.py total: {end_to_end * 1000:8.1f}ms")
+
+
+STUB_SCRIPT = """import sys, time
+time.sleep(float(sys.argv[1]))
+print(sys.argv[2])
+"""
+
+
+def bench_concurrent(args) -> None:
+    """run_concurrently with sleeping stub scripts: wall time must track the slowest job"""
+    with tempfile.TemporaryDirectory() as tmp:
+        stub = Path(tmp) / 'sleep_stub.py'
+        stub.write_text(STUB_SCRIPT, encoding='utf-8')
+
+        def job(seconds, output):
+            return lambda: subprocess.run(
+                [sys.executable, str(stub), str(seconds), output],
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+
+        delays = {'events': args.events, 'tasks': args.tasks}
+        fallbacks = {'events': 'events-fallback', 'tasks': 'tasks-fallback'}
+        # Interpreter start-up of the stubs, measured once and allowed on top of the sleeps
+        _, startup = timed(job(0, 'warm-up'))
+        slack = startup + 0.2
+
+        results, wall = timed(
+            morning_plan.run_concurrently,
+            {name: job(seconds, name) for name, seconds in delays.items()},
+            timeouts={name: seconds + 5 for name, seconds in delays.items()},
+            fallbacks=fallbacks
+        )
+        longest, total = max(delays.values()), sum(delays.values())
+        print(f"  jobs {delays}: wall {wall:.2f}s (max {longest:.2f}s, sum {total:.2f}s)")
+        if results != {'events': 'events', 'tasks': 'tasks'}:
+            print(f"  FAILED: unexpected results {results}")
+            sys.exit(1)
+        if not longest <= wall < longest + slack:
+            print(f"  FAILED: wall time {wall:.2f}s is not ~max ({longest:.2f}s + {slack:.2f}s)")
+            sys.exit(1)
+
+        # A hung calendar yields its fallback at its timeout, the tasks still finish
+        timeout = args.events / 2
+        hung = dict(delays, events=args.events + args.tasks + 5)
+        results, wall = timed(
+            morning_plan.run_concurrently,
+            {name: job(seconds, name) for name, seconds in hung.items()},
+            timeouts={'events': timeout, 'tasks': args.tasks + 5},
+            fallbacks=fallbacks
+        )
+        print(f"  events timeout {timeout:.2f}s: wall {wall:.2f}s, results {results}")
+        if results != {'events': 'events-fallback', 'tasks': 'tasks'}:
+            print("  FAILED: timed-out job did not fall back")
+            sys.exit(1)
+        if not wall < max(timeout, args.tasks) + slack:
+            print(f"  FAILED: timed-out job held the plan for {wall:.2f}s")
+            sys.exit(1)
+        print("  ok: jobs overlap, wall time ~ max, not sum")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Task pipeline benchmarks')
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    scan = sub.add_parser('scan', help='Serial vs parallel vault scan')
+    scan.add_argument('--files', type=int, default=10000)
+    scan.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    scan.set_defaults(func=bench_scan)
+
+    tokenizer = sub.add_parser('tokenizer', help='Task attribute extraction throughput')
+    tokenizer.add_argument('--lines', type=int, default=200000)
+    tokenizer.set_defaults(func=bench_tokenizer)
+
+    topk = sub.add_parser('topk', help='Top-K prioritization vs full sort')
+    topk.add_argument('--tasks', type=int, default=50000)
+    topk.add_argument('--limit', type=int, default=8)
+    topk.add_argument('--trials', type=int, default=500)
+    topk.set_defaults(func=bench_topk)
+
+    morning = sub.add_parser('morning', help='In-process vs subprocess task loading')
+    morning.add_argument('--files', type=int, default=2000)
+    morning.add_argument('--repeat', type=int, default=5)
+    morning.set_defaults(func=bench_morning)
+
+    concurrent = sub.add_parser('concurrent', help='Morning plan sources run in parallel')
+    concurrent.add_argument('--events', type=float, default=1.0, help='Calendar stub delay, s')
+    concurrent.add_argument('--tasks', type=float, default=1.5, help='Task stub delay, s')
+    concurrent.set_defaults(func=bench_concurrent)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
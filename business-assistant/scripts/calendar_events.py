@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Calendar events with a local TTL cache
+Morning plan, check-ins and evening review share one fetch per day
+"""
+
+import os
+import json
+import time
+import logging
+import subprocess
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from tasks_parser import get_cache_dir
+
+CACHE_FILENAME = 'calendar_cache.json'
+DEFAULT_CALENDAR_SCRIPT = Path.home() / '.openclaw/workspace/calendar/list_events.js'
+DEFAULT_TIMEOUT_SECONDS = 10
+# Same-day reads: events added during the day show up within this window
+DEFAULT_TTL_MINUTES = 15
+# Ranges fetched the day before they start (evening prefetch), kept until the morning
+DEFAULT_PREFETCH_TTL_MINUTES = 900
+
+logger = logging.getLogger('business_assistant.calendar')
+
+
+class CalendarCache:
+    """
+    Parsed events keyed by date range, stored as JSON with a TTL. A range fetched
+    before its start date (prefetch) lives for prefetch_ttl_seconds instead.
+    """
+    
+    def __init__(self, path: Path, ttl_seconds: float, prefetch_ttl_seconds: Optional[float] = None):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.prefetch_ttl_seconds = ttl_seconds if prefetch_ttl_seconds is None else prefetch_ttl_seconds
+        try:
+            self.entries = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.entries = {}
+    
+    @staticmethod
+    def key(start_date: str, days: Optional[int]) -> str:
+        """'2026-02-20+2' for an explicit --date/--days fetch, '2026-02-20+default' without args"""
+        return f"{start_date}+{days if days is not None else 'default'}"
+    
+    def entry_ttl(self, key: str, entry: Dict) -> float:
+        fetched_on = datetime.fromtimestamp(entry['fetched_at']).strftime('%Y-%m-%d')
+        return self.prefetch_ttl_seconds if fetched_on < key.split('+')[0] else self.ttl_seconds
+    
+    def get(self, key: str) -> Optional[List[str]]:
+        """Cached events for the range, or None if missing or expired"""
+        entry = self.entries.get(key)
+        if entry is None:
+            logger.debug("calendar cache miss: %s", key)
+            return None
+        age = time.time() - entry['fetched_at']
+        if age > self.entry_ttl(key, entry):
+            logger.debug("calendar cache expired: %s (age %.0fs)", key, age)
+            return None
+        logger.debug("calendar cache hit: %s (age %.0fs)", key, age)
+        return entry['events']
+    
+    def put(self, key: str, events: List[str]) -> None:
+        now = time.time()
+        # Drop expired ranges so the file does not grow day after day
+        self.entries = {
+            k: v for k, v in self.entries.items() if now - v['fetched_at'] <= self.entry_ttl(k, v)
+        }
+        self.entries[key] = {'fetched_at': now, 'events': events}
+        self._save()
+        logger.debug("calendar cache store: %s (%d events)", key, len(events))
+    
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Forget one range, or everything when key is None"""
+        if key is None:
+            self.entries = {}
+        else:
+            self.entries.pop(key, None)
+        self._save()
+        logger.debug("calendar cache invalidated: %s", key or 'all')
+    
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.entries, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+
+def open_cache(config: Dict) -> CalendarCache:
+    """Calendar cache configured from config.json"""
+    calendar = config.get('calendar', {})
+    ttl_minutes = calendar.get('cache_ttl_minutes', DEFAULT_TTL_MINUTES)
+    prefetch_ttl_minutes = calendar.get('prefetch_ttl_minutes', DEFAULT_PREFETCH_TTL_MINUTES)
+    return CalendarCache(get_cache_dir(config) / CACHE_FILENAME, ttl_minutes * 60,
+                         prefetch_ttl_minutes * 60)
+
+
+def uses_defaults(start_date: str, days: int) -> bool:
+    """Today alone is what list_events.js returns without arguments"""
+    return days == 1 and start_date == datetime.now().strftime('%Y-%m-%d')
+
+
+def fetch_key(start_date: str, days: int) -> str:
+    """Cache key for what fetch_events actually requests for the range"""
+    return CalendarCache.key(start_date, None if uses_defaults(start_date, days) else days)
+
+
+def lookup_keys(start_date: str, days: int) -> List[str]:
+    """
+    Keys that hold events for the range: the explicit fetch (e.g. prefetched the
+    evening before) first, then a no-argument fetch of today
+    """
+    keys = [CalendarCache.key(start_date, days)]
+    if uses_defaults(start_date, days):
+        keys.append(CalendarCache.key(start_date, None))
+    return keys
+
+
+def fetch_events(script_path: Path, start_date: str, days: int,
+                 timeout: float = DEFAULT_TIMEOUT_SECONDS) -> Optional[List[str]]:
+    """
+    Run list_events.js. Today alone uses the script defaults (works with any
+    version of the script); other ranges are requested with --date/--days.
+    Returns None if the script fails.
+    """
+    cmd = ['node', str(script_path)]
+    if not uses_defaults(start_date, days):
+        cmd += ['--date', start_date, '--days', str(days)]
+    
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        return None
+    
+    # Parse output
+    return [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
+
+
+def get_calendar_events(script_path: Path = None, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                        start_date: str = None, days: int = 1,
+                        cache: Optional[CalendarCache] = None) -> List[str]:
+    """Get calendar events for a date range (today by default)"""
+    start_date = start_date or datetime.now().strftime('%Y-%m-%d')
+    
+    if cache is not None:
+        for key in lookup_keys(start_date, days):
+            events = cache.get(key)
+            if events is not None:
+                return events
+    
+    try:
+        calendar_script = Path(script_path or DEFAULT_CALENDAR_SCRIPT).expanduser()
+        if not calendar_script.exists():
+            return []
+        events = fetch_events(calendar_script, start_date, days, timeout)
+        if events is None:
+            return []
+        if cache is not None:
+            cache.put(fetch_key(start_date, days), events)
+        return events
+    except Exception as e:
+        return [f"⚠️ Не удалось загрузить календарь: {e}"]
+
+
+def prefetch_tomorrow(config: Dict) -> None:
+    """
+    Warm the cache with tomorrow's events (used by the evening review).
+    Needs a list_events.js that understands --date/--days: one that ignores them
+    would cache today's events as tomorrow's.
+    """
+    calendar = config.get('calendar', {})
+    if not calendar.get('enabled', True):
+        return
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    logger.debug("prefetching calendar for %s", tomorrow)
+    get_calendar_events(
+        calendar.get('script_path'),
+        calendar.get('timeout_seconds', DEFAULT_TIMEOUT_SECONDS),
+        start_date=tomorrow,
+        days=calendar.get('lookahead_days', 1),
+        cache=open_cache(config)
+    )
@@ -5,6 +5,20 @@ Midday/afternoon check-in
 
 import sys
 
+import task_daemon
+import tasks_parser
+
+
+def get_focus_tasks(limit: int = 3):
+    """Top tasks from the daemon or a direct scan; empty if the vault is unavailable"""
+    try:
+        config = tasks_parser.load_config()
+        return task_daemon.get_task_output(config, limit=limit)['tasks']
+    except Exception as e:
+        print(f"Warning: tasks unavailable: {e}", file=sys.stderr)
+        return []
+
+
 def main():
     time_of_day = sys.argv[1] if len(sys.argv) > 1 else "midday"
     
@@ -28,6 +42,13 @@ def main():
 🔄 **Нужно скорректировать план?**
 """
     
+    focus = get_focus_tasks()
+    if focus:
+        message += "\n🎯 **Главное на сегодня:**\n"
+        for task in focus:
+            marker = "🔴 " if task.get('overdue') else ""
+            message += f"- {marker}{task['text']}\n"
+    
     print(message)
 
 
@@ -3,46 +3,81 @@
 Evening review - analyze day and prepare for tomorrow
 """
 
+import sys
 import json
+import logging
+import argparse
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import diary
+import history
+import task_daemon
+import tasks_parser
+import calendar_events
 
 def parse_daily_file(date_str: str, vault_path: str, diary_path: str):
     """Parse today's daily file for completed tasks"""
-    daily_file = Path(vault_path) / diary_path / f"{date_str}.md"
-    
-    if not daily_file.exists():
+    daily = diary.read_diary(Path(vault_path) / diary_path / f"{date_str}.md")
+    if daily is None:
         return {"completed": [], "incomplete": []}
-    
-    completed = []
-    incomplete = []
-    
-    with open(daily_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip().startswith('- [x]') or line.strip().startswith('- [X]'):
-                task = line.strip()[6:].strip()
-                completed.append(task)
-            elif line.strip().startswith('- [ ]'):
-                task = line.strip()[6:].strip()
-                incomplete.append(task)
-    
-    return {"completed": completed, "incomplete": incomplete}
+    return {"completed": daily.completed_tasks, "incomplete": daily.open_tasks}
+
+
+def get_tomorrow_candidates(config: dict, limit: int = 3) -> list:
+    """Top task texts from the daemon or a direct scan; empty if the vault is unavailable"""
+    try:
+        return [t['text'] for t in task_daemon.get_task_output(config, limit=limit)['tasks']]
+    except Exception as e:
+        print(f"Warning: tasks unavailable: {e}", file=sys.stderr)
+        return []
 
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description='Evening review')
+    parser.add_argument('--config', type=Path, help='Path to config.json')
+    parser.add_argument('--backfill', type=int, default=0, metavar='DAYS',
+                        help='Index the previous DAYS diary files missing from history')
+    parser.add_argument('--no-prefetch', action='store_true',
+                        help="Do not warm tomorrow's calendar cache")
+    parser.add_argument('--debug', action='store_true', help='Debug log to stderr')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING,
+                        format='%(levelname)s %(name)s: %(message)s')
+    
     # Load config
-    config_path = Path(__file__).parent.parent / 'config.json'
+    config_path = args.config or Path(__file__).parent.parent / 'config.json'
     with open(config_path) as f:
         config = json.load(f)
     
+    vault_path = config['obsidian']['vault_path']
+    diary_path = config['obsidian']['diary_path']
+    history_index = history.open_history(config)
+    # Shared first-seen dates: per-task ages and the longest-carried list agree
+    ages = tasks_parser.open_task_ages(config)
+    
+    # One-off indexing of older days, oldest first so carry-over ages add up
+    now = datetime.now()
+    missing = [
+        (now - timedelta(days=offset)).strftime('%Y-%m-%d')
+        for offset in range(args.backfill, 0, -1)
+    ]
+    missing = [day for day in missing if day not in history_index.days]
+    paths = [Path(vault_path) / diary_path / f"{day}.md" for day in missing]
+    io_threads = tasks_parser.get_io_threads(config)
+    for day, past in zip(missing, diary.read_diaries(paths, io_threads)):
+        if past and past.tasks:
+            history_index.record_day(day, past.completed_tasks, past.open_tasks, ages)
+    
     # Parse today
-    today = datetime.now().strftime('%Y-%m-%d')
-    tasks = parse_daily_file(
-        today,
-        config['obsidian']['vault_path'],
-        config['obsidian']['diary_path']
-    )
+    today = now.strftime('%Y-%m-%d')
+    tasks = parse_daily_file(today, vault_path, diary_path)
+    
+    history_index.record_day(today, tasks['completed'], tasks['incomplete'], ages)
+    history_index.save()
+    ages.save()
     
     completed_count = len(tasks['completed'])
     incomplete_count = len(tasks['incomplete'])
@@ -65,15 +100,39 @@ def main():
         review += f"\n⏳ **Не завершено:** {incomplete_count} задач(и)\n"
         review += "\n**Переносится на завтра:**\n"
         for task in tasks['incomplete'][:3]:
-            review += f"- {task}\n"
+            first_seen = ages.observe(tasks_parser.task_hash(task), today)
+            age = (now.date() - datetime.fromisoformat(first_seen).date()).days
+            review += f"- {task}" + (f" (висит {age} дн.)" if age > 0 else "") + "\n"
+    
+    # Trends from the history index
+    rates = [
+        (days, history_index.completion_rate(now.date(), days))
+        for days in history.ROLLING_WINDOWS
+    ]
+    rates = [f"{days} дн: {rate:.0f}%" for days, rate in rates if rate is not None]
+    if rates:
+        review += f"\n📈 **Выполнение:** {' · '.join(rates)}\n"
+    
+    carried = history_index.longest_carried(now.date(), ages)
+    if carried:
+        review += "\n🔁 **Дольше всего переносятся:**\n"
+        for text, age in carried:
+            review += f"- {text} — {age} дн.\n"
     
     review += "\n💡 **Что помешало/помогло сегодня?**\n"
     review += "(Напиши свой инсайт — где время утекло, что сработало хорошо)\n\n"
     
     review += "📅 **Топ-3 приоритета на завтра:**\n"
-    review += "1. \n2. \n3. \n"
+    # Candidates from the task daemon (or a direct scan), the rest left blank
+    candidates = get_tomorrow_candidates(config)
+    for i in range(3):
+        review += f"{i + 1}. {candidates[i] if i < len(candidates) else ''}\n"
     
     print(review)
+    
+    # Warm tomorrow's calendar after the review is out, so it never delays it
+    if config.get('calendar', {}).get('prefetch_tomorrow') and not args.no_prefetch:
+        calendar_events.prefetch_tomorrow(config)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Free time within work hours from calendar events
+Events become intervals, overlaps are merged, free slots are what is left
+"""
+
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+# "10:00 Встреча", "10:00-11:30 Встреча", "2026-02-20 10:00–11:00 Созвон"
+EVENT_TIME_RE = re.compile(
+    r'^\s*(?:(?P<date>\d{4}-\d{2}-\d{2})[ T]+)?'
+    r'(?P<start>\d{1,2}:\d{2})(?:\s*[-–—]\s*(?P<end>\d{1,2}:\d{2}))?'
+)
+
+# Events without an end time are assumed to take an hour
+DEFAULT_EVENT_MINUTES = 60
+DEFAULT_WORK_HOURS = {'start': '09:00', 'end': '17:00'}
+
+
+def _parse_clock(value: str) -> time:
+    hours, minutes = value.split(':')
+    return time(int(hours), int(minutes))
+
+
+def parse_event_interval(event: str, default_date: date) -> Optional[Interval]:
+    """Interval of a calendar line, or None if it has no start time"""
+    match = EVENT_TIME_RE.match(event)
+    if not match:
+        return None
+    try:
+        day = date.fromisoformat(match.group('date')) if match.group('date') else default_date
+        start = datetime.combine(day, _parse_clock(match.group('start')))
+        if match.group('end'):
+            end = datetime.combine(day, _parse_clock(match.group('end')))
+            if end <= start:
+                end += timedelta(days=1)  # runs past midnight
+        else:
+            end = start + timedelta(minutes=DEFAULT_EVENT_MINUTES)
+    except ValueError:
+        return None
+    return start, end
+
+
+def merge_intervals(intervals: List[Interval]) -> List[Interval]:
+    """Sort and merge overlapping or touching intervals"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def work_windows(start_date: date, days: int, work_hours: Optional[Dict] = None) -> List[Interval]:
+    """Work-hour window for each day of the range"""
+    work_hours = work_hours or DEFAULT_WORK_HOURS
+    day_start = _parse_clock(work_hours['start'])
+    day_end = _parse_clock(work_hours['end'])
+    windows = []
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        windows.append((datetime.combine(day, day_start), datetime.combine(day, day_end)))
+    return windows
+
+
+def free_slots(busy: List[Interval], windows: List[Interval]) -> List[Interval]:
+    """
+    Subtract merged busy intervals from sorted work windows.
+    Single sweep over both lists: O((events + days) log events) overall.
+    """
+    busy = merge_intervals(busy)
+    slots = []
+    i = 0
+    for window_start, window_end in windows:
+        # Skip meetings that ended before this window
+        while i < len(busy) and busy[i][1] <= window_start:
+            i += 1
+        cursor = window_start
+        j = i
+        while j < len(busy) and busy[j][0] < window_end:
+            if busy[j][0] > cursor:
+                slots.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < window_end:
+            slots.append((cursor, window_end))
+    return slots
+
+
+def minutes(interval: Interval) -> int:
+    return int((interval[1] - interval[0]).total_seconds() // 60)
+
+
+def largest_block(slots: List[Interval]) -> Optional[Interval]:
+    """Longest contiguous free slot"""
+    return max(slots, key=minutes, default=None)
+
+
+def analyze_day(events: List[str], day: date, work_hours: Optional[Dict] = None,
+                days: int = 1, event_days: int = 1) -> Dict:
+    """
+    Free time for `days` days starting at `day`.
+    Events without a parsable time still cost DEFAULT_EVENT_MINUTES each,
+    but cannot be placed, so they only reduce the total.
+    `event_days` is how many days the calendar output covers. Dated events
+    outside the analyzed days never touch their work windows; lines without a
+    date belong to `day` only in a single-day listing and are skipped otherwise.
+    """
+    busy = []
+    unplaced = 0
+    for event in events:
+        if not event or event.startswith('⚠️'):
+            continue
+        if event_days > 1:
+            match = EVENT_TIME_RE.match(event)
+            if not (match and match.group('date')):
+                continue  # day unknown in a multi-day listing
+        interval = parse_event_interval(event, day)
+        if interval is None:
+            unplaced += 1
+        else:
+            busy.append(interval)
+
+    slots = free_slots(busy, work_windows(day, days, work_hours))
+    free_minutes = sum(minutes(slot) for slot in slots) - unplaced * DEFAULT_EVENT_MINUTES
+    return {
+        'free_minutes': max(free_minutes, 0),
+        'slots': slots,
+        'focus_block': largest_block(slots),
+    }
+
+
+def fit_tasks(estimates: List[Optional[int]], slots: List[Interval]) -> List[Optional[datetime]]:
+    """
+    First-fit tasks (by estimated minutes, in plan order) into free slots.
+    Returns a start time per task, None if it has no estimate or does not fit.
+    """
+    remaining = [list(slot) for slot in slots]
+    starts = []
+    for estimate in estimates:
+        start = None
+        if estimate:
+            for slot in remaining:
+                if minutes(slot) >= estimate:
+                    start = slot[0]
+                    slot[0] = slot[0] + timedelta(minutes=estimate)
+                    break
+        starts.append(start)
+    return starts
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Completion history across reviewed days
+Per-day counts and task hashes, plus the set of tasks currently carried over
+"""
+
+import os
+import json
+from pathlib import Path
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from tasks_parser import TaskAges, get_cache_dir, task_hash
+
+HISTORY_FILENAME = 'completion_history.json'
+ROLLING_WINDOWS = (7, 30, 90)
+
+
+class CompletionHistory:
+    """
+    JSON index updated once per reviewed day:
+    - days: date -> completed/incomplete counts and task hashes
+    - open: hash -> text of the tasks currently carried over
+    Ages come from TaskAges, the same first-seen dates the review shows per task.
+    Reports read a bounded number of entries, never the diary files.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            data = {}
+        self.days: Dict[str, Dict] = data.get('days', {})
+        # Older files stored {'text', 'first_seen'} per task; ages now live in TaskAges
+        self.open: Dict[str, str] = {
+            h: info['text'] if isinstance(info, dict) else info
+            for h, info in data.get('open', {}).items()
+        }
+        self.open_as_of: Optional[str] = data.get('open_as_of')
+
+    def record_day(self, date_str: str, completed: List[str], incomplete: List[str],
+                   ages: TaskAges) -> None:
+        """Store (or overwrite) a day's review, update carried-over tasks and their ages"""
+        self.days[date_str] = {
+            'completed': len(completed),
+            'incomplete': len(incomplete),
+            'completed_hashes': [task_hash(t) for t in completed],
+            'incomplete_hashes': [task_hash(t) for t in incomplete],
+        }
+
+        # Carried-over set follows the most recent reviewed day with tasks: a day
+        # without a note (or without checkboxes) says nothing about what is still open
+        if not completed and not incomplete:
+            return
+        for text in incomplete:
+            ages.observe(task_hash(text), date_str)
+        if self.open_as_of and date_str < self.open_as_of:
+            return
+        self.open = {task_hash(text): text for text in incomplete}
+        self.open_as_of = date_str
+
+    def completion_rate(self, end: date, days: int) -> Optional[float]:
+        """Completion % over `days` days ending at `end`, None without data"""
+        completed = total = 0
+        for offset in range(days):
+            day = self.days.get((end - timedelta(days=offset)).isoformat())
+            if day:
+                completed += day['completed']
+                total += day['completed'] + day['incomplete']
+        return completed / total * 100 if total else None
+
+    def longest_carried(self, today: date, ages: TaskAges,
+                        limit: int = 3) -> List[Tuple[str, int]]:
+        """Open tasks with the most days since first seen"""
+        carried = [
+            (text, (today - date.fromisoformat(ages.first_seen.get(h, self.open_as_of))).days)
+            for h, text in self.open.items()
+        ]
+        carried.sort(key=lambda item: item[1], reverse=True)
+        return [item for item in carried[:limit] if item[1] > 0]
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(
+            json.dumps({'days': self.days, 'open': self.open, 'open_as_of': self.open_as_of},
+                       ensure_ascii=False),
+            encoding='utf-8'
+        )
+        os.replace(tmp_path, self.path)
+
+
+def open_history(config: Dict) -> CompletionHistory:
+    return CompletionHistory(get_cache_dir(config) / HISTORY_FILENAME)
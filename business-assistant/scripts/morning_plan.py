@@ -3,52 +3,110 @@
 Generate morning daily plan
 """
 
+import os
+import sys
 import json
+import logging
+import argparse
+import time
+import threading
 import subprocess
 from pathlib import Path
 from datetime import datetime, timedelta
 
-def get_calendar_events():
-    """Get today's calendar events"""
-    try:
-        calendar_script = Path.home() / '.openclaw/workspace/calendar/list_events.js'
-        if calendar_script.exists():
-            result = subprocess.run(
-                ['node', str(calendar_script)],
-                capture_output=True,
-                text=True,
-                timeout=10
+import free_time
+import task_daemon
+import tasks_parser
+import calendar_events
+from calendar_events import DEFAULT_TIMEOUT_SECONDS, get_calendar_events
+
+def get_tasks(config: dict = None, config_path: Path = None,
+              timeout: float = DEFAULT_TIMEOUT_SECONDS, cancel: threading.Event = None):
+    """
+    Get prioritized tasks from Obsidian (daemon, in-process, subprocess as fallback).
+    Setting `cancel` stops an in-process scan and its worker pools.
+    """
+    if config is not None:
+        tasks_data = task_daemon.query_daemon(config)
+        if tasks_data is not None:
+            return tasks_data
+        try:
+            now = datetime.now()
+            tasks, summary = tasks_parser.collect_tasks(
+                config, now=now, workers=os.cpu_count() or 1, cancel=cancel
             )
-            if result.returncode == 0:
-                # Parse output
-                events = []
-                for line in result.stdout.strip().split('\n'):
-                    if line.strip():
-                        events.append(line.strip())
-                return events
-        return []
-    except Exception as e:
-        return [f"⚠️ Не удалось загрузить календарь: {e}"]
+            return dict(summary, tasks=[t.to_dict(now) for t in tasks])
+        except tasks_parser.ScanCancelled:
+            return {'total_found': 0, 'tasks': []}
+        except Exception as e:
+            print(f"In-process task scan failed, falling back to subprocess: {e}", file=sys.stderr)
+    
+    return get_tasks_subprocess(config_path, timeout)
 
 
-def get_tasks():
-    """Get prioritized tasks from Obsidian"""
+def get_tasks_subprocess(config_path: Path = None, timeout: float = DEFAULT_TIMEOUT_SECONDS):
+    """Run tasks_parser.py in a separate interpreter and stream its NDJSON output"""
     try:
         parser_script = Path(__file__).parent / 'tasks_parser.py'
-        result = subprocess.run(
-            ['python3', str(parser_script)],
-            capture_output=True,
-            text=True,
-            timeout=10
+        cmd = [sys.executable or 'python3', str(parser_script), '--format', 'ndjson']
+        if config_path:
+            cmd += ['--config', str(config_path)]
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
         )
-        if result.returncode == 0:
-            return json.loads(result.stdout)
+        # Kill the scan if it overruns; tasks streamed so far are kept
+        timer = threading.Timer(timeout, proc.kill)
+        timer.start()
+        try:
+            tasks_data = tasks_parser.read_ndjson_tasks(proc.stdout)
+        finally:
+            timer.cancel()
+            proc.stdout.close()
+            proc.wait()
+        if proc.returncode == 0 or tasks_data['tasks']:
+            return tasks_data
         return {'total_found': 0, 'tasks': []}
     except Exception as e:
         print(f"Error getting tasks: {e}")
         return {'total_found': 0, 'tasks': []}
 
 
+def run_concurrently(jobs: dict, timeouts: dict, fallbacks: dict, cancels: dict = None) -> dict:
+    """
+    Run callables concurrently, each with its own timeout.
+    A job that fails or misses its deadline yields its fallback value, so one
+    slow source never blocks the other. Threads are daemons and are abandoned
+    on timeout; cancels[name], if given, is called for a job still running then,
+    so it can stop work that would otherwise keep the interpreter alive at exit
+    (subprocess-based jobs enforce their own timeouts).
+    """
+    results = {}
+    threads = {}
+    
+    def run(name, func):
+        try:
+            results[name] = func()
+        except Exception as e:
+            print(f"{name} failed: {e}", file=sys.stderr)
+    
+    for name, func in jobs.items():
+        thread = threading.Thread(target=run, args=(name, func), daemon=True)
+        thread.start()
+        threads[name] = thread
+    
+    started = time.monotonic()
+    for name, thread in threads.items():
+        remaining = timeouts[name] - (time.monotonic() - started)
+        thread.join(max(remaining, 0))
+        if thread.is_alive() and cancels and name in cancels:
+            cancels[name]()
+    
+    return {name: results.get(name, fallbacks[name]) for name in jobs}
+
+
 def create_daily_file(date_str: str, template_path: Path, diary_path: Path):
     """Create daily file from template"""
     daily_file = diary_path / f"{date_str}.md"
@@ -78,19 +136,21 @@ def create_daily_file(date_str: str, template_path: Path, diary_path: Path):
     return daily_file
 
 
-def estimate_available_time(events: list) -> int:
-    """Estimate available work time in minutes"""
-    # Simple heuristic: 8 working hours - 1h per meeting
-    total_minutes = 8 * 60  # 8 hours
-    meetings = len([e for e in events if e and not e.startswith('⚠️')])
-    meeting_time = meetings * 60  # Assume 1h per meeting
-    
-    return max(total_minutes - meeting_time, 0)
+def estimate_available_time(events: list, work_hours: dict = None, event_days: int = 1) -> int:
+    """Free work time today in minutes (work hours minus merged meeting intervals)"""
+    return free_time.analyze_day(events, datetime.now().date(), work_hours,
+                                 event_days=event_days)['free_minutes']
 
 
-def format_plan(tasks_data: dict, events: list) -> str:
-    """Format daily plan message"""
+def format_slot(slot) -> str:
+    return f"{slot[0].strftime('%H:%M')}–{slot[1].strftime('%H:%M')}"
+
+
+def format_plan(tasks_data: dict, events: list, work_hours: dict = None,
+                event_days: int = 1) -> str:
+    """Format daily plan message (`event_days`: days covered by the calendar output)"""
     today = datetime.now()
+    day = free_time.analyze_day(events, today.date(), work_hours, event_days=event_days)
     date_str = today.strftime('%Y-%m-%d')
     weekday_ru = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота', 'Воскресенье']
     weekday = weekday_ru[today.weekday()]
@@ -107,30 +167,49 @@ def format_plan(tasks_data: dict, events: list) -> str:
     # Tasks
     tasks = tasks_data.get('tasks', [])
     
+    if tasks_data.get('error'):
+        plan += f"⚠️ {tasks_data['error']}\n\n"
+    
     if tasks:
-        # High priority / overdue
         urgent = [t for t in tasks if t.get('overdue') or t.get('priority') == 'high']
+        regular = [t for t in tasks if not (t.get('overdue') or t.get('priority') == 'high')]
+        regular = regular[:5]  # Top 5 regular tasks
+        
+        # Place estimated tasks into real free slots, in plan order
+        starts = free_time.fit_tasks(
+            [t.get('estimated_minutes') for t in urgent + regular], day['slots']
+        )
+        slot_hint = {
+            id(task): f" → {start.strftime('%H:%M')}"
+            for task, start in zip(urgent + regular, starts) if start
+        }
+        
+        # High priority / overdue
         if urgent:
             plan += "## 🔥 Срочные/важные:\n"
             for task in urgent:
                 deadline = f" 📅 {task['deadline'][:10]}" if task.get('deadline') else ""
-                plan += f"- [ ] {task['text']}{deadline}\n"
+                plan += f"- [ ] {task['text']}{deadline}{slot_hint.get(id(task), '')}\n"
             plan += "\n"
         
         # Regular tasks
-        regular = [t for t in tasks if not (t.get('overdue') or t.get('priority') == 'high')]
         if regular:
             plan += "## 📝 Задачи:\n"
-            for task in regular[:5]:  # Top 5 regular tasks
+            for task in regular:
                 deadline = f" 📅 {task['deadline'][:10]}" if task.get('deadline') else ""
                 time_est = f" ({task['estimated_minutes']}м)" if task.get('estimated_minutes') else ""
-                plan += f"- [ ] {task['text']}{deadline}{time_est}\n"
+                plan += f"- [ ] {task['text']}{deadline}{time_est}{slot_hint.get(id(task), '')}\n"
             plan += "\n"
     
     # Time estimate
-    available_minutes = estimate_available_time(events)
-    available_hours = available_minutes / 60
-    plan += f"## ⏰ Доступное время: ~{available_hours:.1f}ч\n\n"
+    available_hours = day['free_minutes'] / 60
+    plan += f"## ⏰ Доступное время: ~{available_hours:.1f}ч\n"
+    if day['focus_block']:
+        focus_hours = free_time.minutes(day['focus_block']) / 60
+        plan += f"🎯 Фокус-блок: {format_slot(day['focus_block'])} ({focus_hours:.1f}ч)\n"
+    if day['slots']:
+        plan += f"🪟 Свободные окна: {', '.join(format_slot(slot) for slot in day['slots'])}\n"
+    plan += "\n"
     
     # Question
     plan += "❓ Что добавить/изменить в плане?\n"
@@ -140,8 +219,18 @@ def format_plan(tasks_data: dict, events: list) -> str:
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description='Generate morning daily plan')
+    parser.add_argument('--config', type=Path, help='Path to config.json')
+    parser.add_argument('--refresh-calendar', action='store_true',
+                        help='Ignore cached calendar events and fetch them again')
+    parser.add_argument('--debug', action='store_true', help='Debug log to stderr')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING,
+                        format='%(levelname)s %(name)s: %(message)s')
+    
     # Load config
-    config_path = Path(__file__).parent.parent / 'config.json'
+    config_path = args.config or Path(__file__).parent.parent / 'config.json'
     with open(config_path) as f:
         config = json.load(f)
     
@@ -155,12 +244,46 @@ def main():
     
     daily_file = create_daily_file(today, template_path, diary_path)
     
-    # Get data
-    events = get_calendar_events()
-    tasks_data = get_tasks()
+    # Fetch calendar and tasks concurrently, each with its own timeout
+    calendar = config.get('calendar', {})
+    calendar_timeout = calendar.get('timeout_seconds', DEFAULT_TIMEOUT_SECONDS)
+    tasks_timeout = config.get('scan', {}).get('timeout_seconds', DEFAULT_TIMEOUT_SECONDS)
+    
+    lookahead_days = calendar.get('lookahead_days', 1)
+    cache = calendar_events.open_cache(config)
+    if args.refresh_calendar:
+        for key in calendar_events.lookup_keys(today, lookahead_days):
+            cache.invalidate(key)
+    
+    def load_events():
+        if not calendar.get('enabled', True):
+            return []
+        return get_calendar_events(
+            calendar.get('script_path'), calendar_timeout,
+            start_date=today, days=lookahead_days, cache=cache
+        )
+    
+    # The in-process scan runs worker pools that are joined at exit: stop it on timeout
+    tasks_cancel = threading.Event()
+    results = run_concurrently(
+        {
+            'events': load_events,
+            'tasks': lambda: get_tasks(config, config_path, tasks_timeout, tasks_cancel),
+        },
+        timeouts={'events': calendar_timeout, 'tasks': tasks_timeout},
+        fallbacks={
+            'events': [f"⚠️ Календарь не ответил за {calendar_timeout}с"],
+            'tasks': {'total_found': 0, 'tasks': [],
+                      'error': f"Задачи не загрузились за {tasks_timeout}с"},
+        },
+        cancels={'tasks': tasks_cancel.set}
+    )
+    events = results['events']
+    tasks_data = results['tasks']
     
     # Format plan
-    plan = format_plan(tasks_data, events)
+    plan = format_plan(tasks_data, events, config.get('user', {}).get('work_hours'),
+                       event_days=lookahead_days)
     
     print(plan)
 
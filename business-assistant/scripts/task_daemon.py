@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Task daemon: keeps the prioritized task set hot in memory
+Polls tasks_sources for changed files, re-parses only those and serves the
+current result over a local Unix socket (python3 tasks_parser.py --daemon)
+"""
+
+import os
+import sys
+import json
+import signal
+import socket
+import threading
+import socketserver
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import tasks_parser
+from tasks_parser import Task
+
+SOCKET_FILENAME = 'tasks.sock'
+QUERY_TIMEOUT_SECONDS = 0.5
+
+
+class MemoryTaskIndex:
+    """In-memory counterpart of TaskIndex: path -> (mtime_ns, size, tasks)"""
+
+    def __init__(self):
+        self.entries: Dict[str, tuple] = {}
+        self.begin()
+
+    def begin(self) -> None:
+        """Reset per-scan bookkeeping"""
+        self.seen = set()
+        self.pending_stats = {}
+        self.stats = {'files_total': 0, 'files_cached': 0, 'files_parsed': 0, 'files_removed': 0}
+
+    def check(self, file_path: Path) -> bool:
+        path = str(file_path)
+        self.seen.add(path)
+        self.stats['files_total'] += 1
+        try:
+            st = file_path.stat()
+        except OSError:
+            return False
+        self.pending_stats[path] = st
+        entry = self.entries.get(path)
+        return entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size)
+
+    def load(self, file_path: Path) -> Optional[List[Task]]:
+        self.stats['files_cached'] += 1
+        return self.entries[str(file_path)][2]
+
+    def lookup(self, file_path: Path) -> Optional[List[Task]]:
+        return self.load(file_path) if self.check(file_path) else None
+
+    def store(self, file_path: Path, tasks: List[Task], complete: bool = True) -> None:
+        self.stats['files_parsed'] += 1
+        # Keyed by the pre-parse stat: an edit made while parsing is picked up next poll
+        st = self.pending_stats.pop(str(file_path), None)
+        if st is None:
+            return
+        if not complete:
+            # Tasks that failed to parse: no entry, so the file is re-read next poll
+            self.entries.pop(str(file_path), None)
+            return
+        self.entries[str(file_path)] = (st.st_mtime_ns, st.st_size, tasks)
+
+    def prune(self) -> None:
+        removed = [path for path in self.entries if path not in self.seen]
+        for path in removed:
+            del self.entries[path]
+        self.stats['files_removed'] += len(removed)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.stats['files_parsed'] or self.stats['files_removed'])
+
+
+def get_socket_path(config: Dict) -> Path:
+    return tasks_parser.get_cache_dir(config) / SOCKET_FILENAME
+
+
+class TaskDaemon:
+    """Current task set plus the pre-serialized default response"""
+
+    def __init__(self, config: Dict, workers: int = 1, dedupe: bool = True):
+        self.config = config
+        self.workers = workers
+        self.dedupe = dedupe
+        self.index = MemoryTaskIndex()
+        # (tasks, now, payload) replaced as one object: request threads read it once
+        self.snapshot: Tuple[List[Task], datetime, bytes] = ([], datetime.now(), b'')
+
+    def refresh(self) -> bool:
+        """Rescan the vault; rebuild the response only if files or the date changed"""
+        now = datetime.now()
+        self.index.begin()
+        tasks = tasks_parser.scan_vault_for_tasks(
+            self.config['obsidian']['vault_path'],
+            self.config['obsidian']['tasks_sources'],
+            index=self.index,
+            workers=self.workers,
+            io_threads=tasks_parser.get_io_threads(self.config)
+        )
+        # Deadlines are dates, so overdue flags only move at midnight
+        _, last_now, payload = self.snapshot
+        if payload and not self.index.changed and now.date() == last_now.date():
+            return False
+
+        scanned = len(tasks)
+        tasks = tasks_parser.prepare_tasks(self.config, tasks, now, self.dedupe)
+        extra = {'duplicates_removed': scanned - len(tasks)}
+        # Single attribute store so request threads never see a half-built state
+        self.snapshot = (tasks, now, self.render(tasks, None, now, extra))
+        return True
+
+    def render(self, tasks: List[Task], limit: Optional[int], now: datetime,
+               extra: Optional[Dict] = None) -> bytes:
+        ranked = tasks_parser.rank_tasks(self.config, tasks, limit, now)
+        output = {'total_found': len(ranked), 'tasks': [t.to_dict(now) for t in ranked]}
+        output.update(extra or {})
+        output['daemon'] = {'updated_at': now.isoformat(timespec='seconds'),
+                            'files': len(self.index.entries)}
+        return json.dumps(output, ensure_ascii=False).encode('utf-8') + b'\n'
+
+    def respond(self, request: Dict) -> bytes:
+        """Default limit is served pre-rendered; other limits are ranked on demand"""
+        tasks, now, payload = self.snapshot
+        limit = request.get('limit')
+        if limit is None:
+            return payload
+        return self.render(tasks, limit, now)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(4096)
+        try:
+            request = json.loads(line) if line.strip() else {}
+        except ValueError:
+            request = {}
+        self.wfile.write(self.server.task_daemon.respond(request))
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def query_daemon(config: Dict, limit: Optional[int] = None,
+                 timeout: float = QUERY_TIMEOUT_SECONDS) -> Optional[Dict]:
+    """Task output from a running daemon, or None if it is not running"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    request = {} if limit is None else {'limit': limit}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(get_socket_path(config)))
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return json.loads(b''.join(chunks))
+    except (OSError, ValueError):
+        return None
+
+
+def get_task_output(config: Dict, limit: Optional[int] = None) -> Dict:
+    """Ask the daemon first, fall back to a direct (indexed) scan"""
+    output = query_daemon(config, limit)
+    if output is not None:
+        return output
+    now = datetime.now()
+    tasks, summary = tasks_parser.collect_tasks(config, limit=limit, now=now)
+    return dict(summary, tasks=[t.to_dict(now) for t in tasks])
+
+
+def serve(config: Dict, workers: int = 1, poll_interval: float = 2.0, dedupe: bool = True) -> None:
+    """Run until SIGINT/SIGTERM"""
+    socket_path = get_socket_path(config)
+    if query_daemon(config) is not None:
+        print(f"Daemon already running on {socket_path}", file=sys.stderr)
+        return
+
+    daemon = TaskDaemon(config, workers, dedupe)
+    daemon.refresh()
+
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    if socket_path.exists():
+        socket_path.unlink()  # stale socket from a crashed daemon
+    server = _Server(str(socket_path), _RequestHandler)
+    server.task_daemon = daemon
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving {len(daemon.snapshot[0])} tasks on {socket_path}", file=sys.stderr)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.wait(poll_interval):
+            try:
+                if daemon.refresh():
+                    print(f"Refreshed: {daemon.index.stats}", file=sys.stderr)
+            except Exception as e:
+                print(f"Refresh failed: {e}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        if socket_path.exists():
+            os.unlink(socket_path)
@@ -4,87 +4,244 @@ Parse tasks from Obsidian vault
 Finds uncompleted tasks, prioritizes them, extracts deadlines
 """
 
+import os
 import re
+import sys
 import json
+import time
+import heapq
+import hashlib
+import sqlite3
+import argparse
+import threading
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+import diary
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SKILL_DIR = Path(__file__).parent.parent
+INDEX_FILENAME = 'tasks_index.sqlite'
+# Bumped when the record format changes; an older index is rebuilt
+INDEX_VERSION = 2
+AGES_FILENAME = 'task_ages.json'
+
+# Below this many files a process pool costs more than it saves
+PARALLEL_MIN_FILES = 64
+# Upper bound on files per worker task: a cancelled scan waits for running chunks
+MAX_CHUNK_FILES = 256
+
+# All task attributes in one pattern. Tags only consume the '#', so a deadline
+# written inside a tag (#deadline: ...) is still seen on the same pass.
+ATTRIBUTE_RE = re.compile(
+    r'📅\s*(?P<date_emoji>\d{4}-\d{2}-\d{2})'        # 📅 2026-02-25
+    r'|до\s+(?P<short_day>\d{1,2})\.(?P<short_month>\d{1,2})'  # до 25.02
+    r'|(?i:deadline):\s*(?P<date_keyword>\d{4}-\d{2}-\d{2})'  # deadline: 2026-02-25
+    r'|\((?P<minutes>\d+)\s*(?i:мин|м|min|m)\)'       # (30 мин), (30м)
+    r'|\((?P<hours>\d+)\s*(?i:ч|ч\.|h)\)'             # (2ч), (2h)
+    r'|#(?=(?P<tag>\w+))'                               # #tag
+    r'|(?P<marker>[❗⭐])'                                # priority markers
+)
+
+PRIORITY_SCORES = {'high': 0, 'medium': 1, 'low': 2}
+
+
+class ScanCancelled(Exception):
+    """The scan was stopped through its cancel event"""
+
+DIARY_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+HIGH_PRIORITY_TAGS = ('срочно', 'urgent', 'важно', 'important')
+LOW_PRIORITY_TAGS = ('низкий', 'low')
+
+
+def _parse_iso_date(value: str) -> datetime:
+    # Regex already guarantees YYYY-MM-DD, invalid dates still raise ValueError
+    return datetime(int(value[:4]), int(value[5:7]), int(value[8:10]))
+
+
+def scan_task_fields(text: str) -> tuple:
+    """
+    Extract (priority, deadline_spec, tags, estimated_minutes) in one pass over the text.
+    deadline_spec is 'YYYY-MM-DD', or '--MM-DD' for до DD.MM (year resolved on use).
+    Deadline formats: 📅 YYYY-MM-DD, до DD.MM, deadline: ...; estimates: (30 мин), (2ч), (1h)
+    """
+    date_emoji = short_date = date_keyword = None
+    minutes = hours = None
+    tags = []
+    high = low = False
+    
+    for match in ATTRIBUTE_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'tag':
+            tag = match.group('tag')
+            tags.append(tag)
+            tag_lower = tag.lower()
+            if tag_lower.startswith(HIGH_PRIORITY_TAGS):
+                high = True
+            elif tag_lower.startswith(LOW_PRIORITY_TAGS):
+                low = True
+        elif kind == 'marker':
+            high = True
+        elif kind == 'date_emoji':
+            date_emoji = date_emoji or match.group('date_emoji')
+        elif kind == 'short_month':
+            short_date = short_date or (match.group('short_day'), match.group('short_month'))
+        elif kind == 'date_keyword':
+            date_keyword = date_keyword or match.group('date_keyword')
+        elif kind == 'minutes':
+            minutes = minutes if minutes is not None else int(match.group('minutes'))
+        elif kind == 'hours':
+            hours = hours if hours is not None else int(match.group('hours'))
+    
+    priority = 'high' if high else 'low' if low else 'medium'
+    
+    if date_emoji:
+        deadline_spec = date_emoji
+    elif short_date:
+        deadline_spec = '--%02d-%02d' % (int(short_date[1]), int(short_date[0]))
+    else:
+        deadline_spec = date_keyword
+    
+    if minutes is not None:
+        estimated_minutes = minutes
+    elif hours is not None:
+        estimated_minutes = hours * 60
+    else:
+        estimated_minutes = None
+    
+    return priority, deadline_spec, tags, estimated_minutes
+
+
+def resolve_deadline(deadline_spec: Optional[str]) -> Optional[datetime]:
+    """Deadline datetime for a spec from scan_task_fields; '--MM-DD' falls in the current year"""
+    if not deadline_spec:
+        return None
+    if deadline_spec.startswith('--'):
+        return datetime(datetime.now().year, int(deadline_spec[2:4]), int(deadline_spec[5:7]))
+    return _parse_iso_date(deadline_spec)
+
+
+def scan_task_attributes(text: str) -> tuple:
+    """
+    Extract (priority, deadline, tags, estimated_minutes) in one pass over the text.
+    Deadline formats: 📅 YYYY-MM-DD, до DD.MM, deadline: ...; estimates: (30 мин), (2ч), (1h)
+    """
+    priority, deadline_spec, tags, estimated_minutes = scan_task_fields(text)
+    return priority, resolve_deadline(deadline_spec), tags, estimated_minutes
+
+
+# Everything that changes when a task is carried over or re-tagged, but is not the task itself
+NORMALIZE_RE = re.compile(
+    r'📅\s*\d{4}-\d{2}-\d{2}'
+    r'|(?i:deadline):\s*\d{4}-\d{2}-\d{2}'
+    r'|до\s+\d{1,2}\.\d{1,2}(?:\.\d{2,4})?'
+    r'|\d{4}-\d{2}-\d{2}'
+    r'|\(\d+\s*(?i:мин|м|min|m|ч\.|ч|h)\)'
+    r'|#\w+'
+    r'|[❗⭐]'
+    r'|\(?(?i:перенос на завтра)\)?'
+)
+
+
+def normalize_task_text(text: str) -> str:
+    """Task text without dates, tags, estimates and markers, lowercased and single-spaced"""
+    return ' '.join(NORMALIZE_RE.sub(' ', text).lower().split()).strip(' .,;:-—')
+
+
+def task_hash(text: str) -> str:
+    """Content hash of the normalized task text"""
+    return hashlib.blake2b(normalize_task_text(text).encode('utf-8'), digest_size=8).hexdigest()
+
 
 class Task:
+    """
+    Open checkbox task. Slots keep large vaults compact; overdue/days-left are
+    derived lazily, once per reference time, instead of on every access.
+    """
+    
+    __slots__ = (
+        'text', 'source_file', 'line_number', 'completed', 'priority', 'deadline',
+        'deadline_spec', 'tags', 'estimated_minutes', 'first_seen', '_hash',
+        '_derived_now', '_overdue', '_days_left',
+    )
+    
     def __init__(self, text: str, source_file: str, line_number: int):
         self.text = text
         self.source_file = source_file
         self.line_number = line_number
         self.completed = False
-        self.priority = self._extract_priority()
-        self.deadline = self._extract_deadline()
-        self.tags = self._extract_tags()
-        self.estimated_minutes = self._extract_time_estimate()
-        
-    def _extract_priority(self) -> str:
-        """Extract priority from tags or keywords"""
-        text_lower = self.text.lower()
-        if '#срочно' in text_lower or '#urgent' in text_lower or '❗' in self.text:
-            return 'high'
-        elif '#важно' in text_lower or '#important' in text_lower or '⭐' in self.text:
-            return 'high'
-        elif '#низкий' in text_lower or '#low' in text_lower:
-            return 'low'
-        return 'medium'
-    
-    def _extract_deadline(self) -> Optional[datetime]:
-        """Extract deadline from formats: 📅 YYYY-MM-DD, до DD.MM, deadline: ..."""
-        # Format: 📅 2026-02-25
-        match = re.search(r'📅\s*(\d{4}-\d{2}-\d{2})', self.text)
-        if match:
-            return datetime.strptime(match.group(1), '%Y-%m-%d')
-        
-        # Format: до 25.02
-        match = re.search(r'до\s+(\d{1,2})\.(\d{1,2})', self.text)
-        if match:
-            day, month = int(match.group(1)), int(match.group(2))
-            year = datetime.now().year
-            return datetime(year, month, day)
-        
-        # Format: deadline: 2026-02-25
-        match = re.search(r'deadline:\s*(\d{4}-\d{2}-\d{2})', self.text, re.IGNORECASE)
-        if match:
-            return datetime.strptime(match.group(1), '%Y-%m-%d')
-        
-        return None
+        self.priority, self.deadline_spec, tags, self.estimated_minutes = scan_task_fields(text)
+        self.deadline = resolve_deadline(self.deadline_spec)
+        self.tags = tuple(tags)
+        self.first_seen = None
+        self._hash = None
+        self._derived_now = None
     
-    def _extract_tags(self) -> List[str]:
-        """Extract all #tags"""
-        return re.findall(r'#(\w+)', self.text)
+    @classmethod
+    def from_record(cls, source_file: str, line_number: int, text: str, priority: str,
+                    deadline_spec: Optional[str], tags: List[str],
+                    estimated_minutes: Optional[int]) -> 'Task':
+        """Restore a task from an index record without re-parsing its text"""
+        task = cls.__new__(cls)
+        task.text = text
+        task.source_file = source_file
+        task.line_number = line_number
+        task.completed = False
+        task.priority = priority
+        task.deadline_spec = deadline_spec
+        task.deadline = resolve_deadline(deadline_spec)
+        task.tags = tuple(tags)
+        task.estimated_minutes = estimated_minutes
+        task.first_seen = None
+        task._hash = None
+        task._derived_now = None
+        return task
     
-    def _extract_time_estimate(self) -> Optional[int]:
-        """Extract time estimate: (30 мин), (2ч), (1h)"""
-        # Format: (30 мин) or (30м)
-        match = re.search(r'\((\d+)\s*(?:мин|м|min|m)\)', self.text, re.IGNORECASE)
-        if match:
-            return int(match.group(1))
-        
-        # Format: (2ч) or (2h)
-        match = re.search(r'\((\d+)\s*(?:ч|ч\.|h)\)', self.text, re.IGNORECASE)
-        if match:
-            return int(match.group(1)) * 60
-        
-        return None
+    @property
+    def content_hash(self) -> str:
+        """Hash of the normalized text, shared by copies of the same task"""
+        if self._hash is None:
+            self._hash = task_hash(self.text)
+        return self._hash
     
-    def is_overdue(self) -> bool:
-        """Check if task is overdue"""
+    def _derive(self, now: Optional[datetime]) -> None:
+        # Recompute only for a new reference time; now=None reuses the last one
+        if self._derived_now is not None and (now is None or now is self._derived_now):
+            return
+        now = now or datetime.now()
+        self._derived_now = now
         if self.deadline:
-            return datetime.now() > self.deadline
-        return False
+            self._overdue = now > self.deadline
+            self._days_left = (self.deadline - now).days
+        else:
+            self._overdue = False
+            self._days_left = None
     
-    def days_until_deadline(self) -> Optional[int]:
+    def is_overdue(self, now: Optional[datetime] = None) -> bool:
+        """Check if task is overdue"""
+        self._derive(now)
+        return self._overdue
+    
+    def days_until_deadline(self, now: Optional[datetime] = None) -> Optional[int]:
         """Days until deadline"""
-        if self.deadline:
-            delta = self.deadline - datetime.now()
-            return delta.days
-        return None
+        self._derive(now)
+        return self._days_left
     
-    def to_dict(self) -> Dict:
+    def age_days(self, now: Optional[datetime] = None) -> Optional[int]:
+        """Days since the task was first seen in the vault"""
+        if not self.first_seen:
+            return None
+        return ((now or datetime.now()).date() - datetime.fromisoformat(self.first_seen).date()).days
+    
+    def to_dict(self, now: Optional[datetime] = None) -> Dict:
         """Convert to dict for JSON serialization"""
         return {
             'text': self.text,
@@ -93,114 +250,638 @@ class Task:
             'completed': self.completed,
             'priority': self.priority,
             'deadline': self.deadline.isoformat() if self.deadline else None,
-            'tags': self.tags,
+            'tags': list(self.tags),
             'estimated_minutes': self.estimated_minutes,
-            'overdue': self.is_overdue()
+            'overdue': self.is_overdue(now),
+            'hash': self.content_hash,
+            'first_seen': self.first_seen,
+            'age_days': self.age_days(now)
         }
 
 
-def parse_markdown_tasks(file_path: Path) -> List[Task]:
-    """Parse tasks from a markdown file"""
+def tasks_from_diary(diary_day: Optional['diary.DiaryDay'],
+                     file_path: Path) -> Tuple[List[Task], bool]:
+    """
+    Open checkbox tasks of a parsed markdown file and whether all of them parsed.
+    A bad task skips only its own line; an unreadable file yields no tasks.
+    """
+    if diary_day is None:
+        return [], False
+    source_file = str(file_path)
     tasks = []
+    complete = True
+    for line_number, completed, text in diary_day.tasks:
+        if completed:
+            continue
+        try:
+            tasks.append(Task(text, source_file, line_number))
+        except Exception as e:
+            # e.g. an impossible deadline (до 31.02) must not drop the rest of the file
+            print(f"Error parsing {file_path}:{line_number}: {e}", file=sys.stderr)
+            complete = False
+    return tasks, complete
+
+
+def parse_markdown_tasks(file_path: Path) -> Tuple[List[Task], bool]:
+    """Parse tasks from a markdown file: (tasks, complete)"""
+    return tasks_from_diary(diary.read_diary(file_path), file_path)
+
+
+class TaskIndex:
+    """
+    On-disk SQLite index of parsed tasks keyed by file path + mtime/size.
+    Unchanged files are loaded from the index instead of being re-parsed.
+    """
     
-    if not file_path.exists():
+    def __init__(self, index_path: Path, rebuild: bool = False):
+        self.path = Path(index_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        if not rebuild:
+            rebuild = self.conn.execute('PRAGMA user_version').fetchone()[0] != INDEX_VERSION
+        if rebuild:
+            self.conn.execute('DROP TABLE IF EXISTS tasks')
+            self.conn.execute('DROP TABLE IF EXISTS files')
+            self.conn.execute('PRAGMA user_version = %d' % INDEX_VERSION)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'path TEXT NOT NULL, line_number INTEGER NOT NULL, text TEXT NOT NULL, '
+            'priority TEXT NOT NULL, deadline_spec TEXT, tags TEXT NOT NULL, '
+            'estimated_minutes INTEGER, PRIMARY KEY (path, line_number))'
+        )
+        self.files = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in self.conn.execute('SELECT path, mtime_ns, size FROM files')
+        }
+        self.seen = set()
+        # stat taken by check(), recorded by store() if the file is re-parsed
+        self.pending_stats = {}
+        self.stats = {
+            'rebuilt': rebuild,
+            'files_total': 0,
+            'files_cached': 0,
+            'files_parsed': 0,
+            'files_removed': 0,
+        }
+    
+    def check(self, file_path: Path) -> bool:
+        """True if the file is unchanged since it was indexed"""
+        path = str(file_path)
+        self.seen.add(path)
+        self.stats['files_total'] += 1
+        
+        try:
+            st = file_path.stat()
+        except OSError:
+            return False
+        
+        self.pending_stats[path] = st
+        return self.files.get(path) == (st.st_mtime_ns, st.st_size)
+    
+    def load(self, file_path: Path) -> Optional[List[Task]]:
+        """Tasks of a checked, unchanged file; None if its records must be re-parsed"""
+        path = str(file_path)
+        rows = self.conn.execute(
+            'SELECT line_number, text, priority, deadline_spec, tags, estimated_minutes '
+            'FROM tasks WHERE path = ? ORDER BY line_number',
+            (path,)
+        )
+        try:
+            tasks = [
+                Task.from_record(path, line_number, text, priority, spec, json.loads(tags), minutes)
+                for line_number, text, priority, spec, tags, minutes in rows
+            ]
+        except ValueError:
+            # A record that no longer resolves (29.02 cached in a leap year) or is
+            # corrupt: re-parse the file instead of trusting the index
+            return None
+        
+        self.stats['files_cached'] += 1
         return tasks
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+    def lookup(self, file_path: Path) -> Optional[List[Task]]:
+        """Return cached tasks if the file is unchanged, None otherwise"""
+        return self.load(file_path) if self.check(file_path) else None
+    
+    def store(self, file_path: Path, tasks: List[Task], complete: bool = True) -> None:
+        """
+        Replace index records for a freshly parsed file. The file is keyed by the
+        stat taken before parsing, so an edit made meanwhile is re-parsed next scan.
+        A file with tasks that failed to parse gets no record and is re-parsed too.
+        """
+        path = str(file_path)
+        self.stats['files_parsed'] += 1
+        
+        st = self.pending_stats.pop(path, None)
+        if st is None:
+            return
         
-        for i, line in enumerate(lines, 1):
-            # Uncompleted task: - [ ]
-            if re.match(r'^\s*-\s+\[\s\]\s+', line):
-                task_text = re.sub(r'^\s*-\s+\[\s\]\s+', '', line).strip()
-                task = Task(task_text, str(file_path), i)
-                tasks.append(task)
+        self.conn.execute('DELETE FROM tasks WHERE path = ?', (path,))
+        if not complete:
+            self.conn.execute('DELETE FROM files WHERE path = ?', (path,))
+            self.files.pop(path, None)
+            return
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [
+                (
+                    path, t.line_number, t.text, t.priority, t.deadline_spec,
+                    json.dumps(t.tags, ensure_ascii=False), t.estimated_minutes
+                )
+                for t in tasks
+            ]
+        )
+        self.conn.execute(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?)',
+            (path, st.st_mtime_ns, st.st_size)
+        )
+        self.files[path] = (st.st_mtime_ns, st.st_size)
     
-    except Exception as e:
-        print(f"Error parsing {file_path}: {e}")
+    def prune(self) -> None:
+        """Drop records for files that were not seen during the last scan"""
+        removed = [path for path in self.files if path not in self.seen]
+        for path in removed:
+            self.conn.execute('DELETE FROM tasks WHERE path = ?', (path,))
+            self.conn.execute('DELETE FROM files WHERE path = ?', (path,))
+            del self.files[path]
+        self.stats['files_removed'] += len(removed)
     
-    return tasks
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+
+class TaskAges:
+    """
+    hash -> date a task was first seen anywhere in the vault (JSON file).
+    Lets the parser and the evening review report task age in O(1) per task.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            self.first_seen = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.first_seen = {}
+        self.dirty = False
+    
+    def observe(self, content_hash: str, date_str: str) -> str:
+        """First-seen date for the hash, recording date_str if it is new"""
+        first = self.first_seen.get(content_hash)
+        if first is None or date_str < first:
+            self.first_seen[content_hash] = first = date_str
+            self.dirty = True
+        return first
+    
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.first_seen), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+        self.dirty = False
 
 
-def scan_vault_for_tasks(vault_path: str, sources: List[str]) -> List[Task]:
-    """Scan vault directories for tasks"""
+def dedupe_tasks(tasks: List[Task], score=None) -> List[Task]:
+    """
+    Drop repeated tasks (same content hash), keeping the copy with the lowest
+    score (most urgent deadline/priority). Ties go to the smallest path and line,
+    so the result does not depend on the order files were discovered in.
+    """
+    best: Dict[str, tuple] = {}
+    for task in tasks:
+        rank = (score(task) if score else (), task.source_file, task.line_number)
+        current = best.get(task.content_hash)
+        if current is None or rank < current[0]:
+            best[task.content_hash] = (rank, task)
+    return [task for _, task in best.values()]
+
+
+def discover_markdown_files(vault_path: str, sources: List[str]) -> List[Path]:
+    """List task source files in scan order"""
     vault = Path(vault_path)
-    all_tasks = []
+    files = []
     
     for source in sources:
         source_path = vault / source
         
         if source_path.is_file():
             # Single file
-            all_tasks.extend(parse_markdown_tasks(source_path))
+            files.append(source_path)
         elif source_path.is_dir():
             # Directory - scan all .md files
-            for md_file in source_path.rglob('*.md'):
-                all_tasks.extend(parse_markdown_tasks(md_file))
+            files.extend(source_path.rglob('*.md'))
     
-    return all_tasks
+    return files
 
 
-def prioritize_tasks(tasks: List[Task], high_priority_keywords: List[str]) -> List[Task]:
-    """Sort tasks by priority"""
+def iter_parsed_files(files: List[Path], workers: int = 1, io_threads: int = 1):
+    """
+    Yield (tasks, complete) for each file in input order as soon as it is
+    parsed, on I/O threads (small scans) or sharded across a process pool
+    (large scans)
+    """
+    if workers <= 1 or len(files) < PARALLEL_MIN_FILES:
+        for f, diary_day in zip(files, diary.read_diaries(files, io_threads)):
+            yield tasks_from_diary(diary_day, f)
+        return
+    
+    # Several files per task keeps IPC overhead low on vaults with many small notes
+    chunksize = max(1, min(len(files) // (workers * 4), MAX_CHUNK_FILES))
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield from pool.map(parse_markdown_tasks, files, chunksize=chunksize)
+    finally:
+        # Closed early (cancel, limit): drop queued chunks instead of parsing them
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_vault_files(vault_path: str, sources: List[str], index: Optional[TaskIndex] = None,
+                     workers: int = 1, io_threads: int = 1,
+                     cancel: Optional[threading.Event] = None):
+    """
+    Yield (file, tasks) in scan order: unchanged files straight from the index,
+    changed ones as the parser pipeline delivers them. Only the file being
+    yielded is held in memory; the index is pruned once the scan is complete.
+    Setting `cancel` raises ScanCancelled before the next file; pending parser
+    work is cancelled and the pools shut down, so no worker outlives the scan.
+    """
+    files = discover_markdown_files(vault_path, sources)
+    current = [index is not None and index.check(md_file) for md_file in files]
+    to_parse = list(dict.fromkeys(f for f, ok in zip(files, current) if not ok))
+    parsed = iter_parsed_files(to_parse, workers, io_threads)
+    # A file listed by two sources is parsed once; only such files are kept around
+    occurrences: Dict[Path, int] = {}
+    for md_file in files:
+        occurrences[md_file] = occurrences.get(md_file, 0) + 1
+    done: Dict[Path, List[Task]] = {}
+    
+    try:
+        for md_file, ok in zip(files, current):
+            if cancel is not None and cancel.is_set():
+                raise ScanCancelled()
+            tasks = index.load(md_file) if ok else None
+            if tasks is not None:
+                yield md_file, tasks
+                continue
+            if md_file in done:
+                tasks = done[md_file]
+            else:
+                # Next pipeline result, or an index record that had to be dropped
+                tasks, complete = next(parsed) if not ok else parse_markdown_tasks(md_file)
+                if index is not None:
+                    index.store(md_file, tasks, complete)
+                if occurrences[md_file] > 1:
+                    done[md_file] = tasks
+            yield md_file, tasks
+    finally:
+        parsed.close()
+    
+    if index is not None:
+        index.prune()
+
+
+def scan_vault_for_tasks(vault_path: str, sources: List[str],
+                         index: Optional[TaskIndex] = None, workers: int = 1,
+                         io_threads: int = 1,
+                         cancel: Optional[threading.Event] = None) -> List[Task]:
+    """Scan vault directories for tasks, reusing the index for unchanged files"""
+    return [
+        task
+        for _, tasks in iter_vault_files(vault_path, sources, index, workers, io_threads, cancel)
+        for task in tasks
+    ]
+
+
+def compile_keywords(keywords: List[str]) -> Optional['re.Pattern']:
+    """Case-insensitive substring matcher for all keywords at once"""
+    lowered = [keyword.lower() for keyword in keywords]
+    if not lowered:
+        return None
+    return re.compile('|'.join(re.escape(keyword) for keyword in lowered))
+
+
+def task_score_key(high_priority_keywords: List[str], now: datetime):
+    """Build the sort key shared by full and top-K prioritization"""
+    matcher = compile_keywords(high_priority_keywords)
     
     def task_score(task: Task) -> tuple:
         """Calculate priority score (lower = higher priority)"""
         # Priority level
-        priority_score = {'high': 0, 'medium': 1, 'low': 2}[task.priority]
+        priority_score = PRIORITY_SCORES[task.priority]
         
         # Deadline urgency
-        if task.is_overdue():
+        if task.is_overdue(now):
             deadline_score = -1000  # Highest priority
         elif task.deadline:
-            days = task.days_until_deadline()
+            days = task.days_until_deadline(now)
             deadline_score = days if days is not None else 1000
         else:
             deadline_score = 1000  # No deadline = lower priority
         
         # High-priority project keywords
         keyword_score = 0
-        for keyword in high_priority_keywords:
-            if keyword.lower() in task.text.lower():
-                keyword_score = -100
-                break
+        if matcher is not None and matcher.search(task.text.lower()):
+            keyword_score = -100
         
         return (priority_score, deadline_score, keyword_score)
     
-    return sorted(tasks, key=task_score)
+    return task_score
 
 
-def main():
-    """Main entry point"""
-    import sys
+def prioritize_tasks(tasks: List[Task], high_priority_keywords: List[str],
+                     now: Optional[datetime] = None) -> List[Task]:
+    """Sort tasks by priority"""
+    return sorted(tasks, key=task_score_key(high_priority_keywords, now or datetime.now()))
+
+
+def select_top_tasks(tasks: List[Task], high_priority_keywords: List[str], limit: int,
+                     now: Optional[datetime] = None) -> List[Task]:
+    """
+    Top `limit` tasks in exactly the prioritize_tasks order, via a bounded heap:
+    O(n log k) instead of sorting the whole vault to keep 8 tasks.
+    """
+    key = task_score_key(high_priority_keywords, now or datetime.now())
+    return heapq.nsmallest(limit, tasks, key=key)
+
+
+def iter_ndjson(tasks: List[Task], summary: Dict, now: Optional[datetime] = None):
+    """NDJSON lines: one task dict per line, then {"type": "summary", ...}"""
+    for task in tasks:
+        yield json.dumps(task.to_dict(now), ensure_ascii=False) + '\n'
+    yield json.dumps(dict(type='summary', **summary), ensure_ascii=False) + '\n'
+
+
+def read_ndjson_tasks(lines) -> Dict:
+    """
+    Consume NDJSON produced by `--format ndjson` incrementally.
+    Non-JSON lines (e.g. parse errors printed by the scanner) are skipped.
+    """
+    data = {'tasks': []}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get('type') == 'summary':
+            record.pop('type')
+            data.update(record)
+        else:
+            data['tasks'].append(record)
+    data.setdefault('total_found', len(data['tasks']))
+    return data
+
+
+def peak_rss_kb(children: bool = False) -> Optional[int]:
+    """Peak resident set size of this process (or its finished children) in KB"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+
+def get_cache_dir(config: Dict) -> Path:
+    """Resolve the cache directory (relative paths are inside the skill dir)"""
+    cache_dir = Path(config.get('cache', {}).get('dir', '.cache')).expanduser()
+    if not cache_dir.is_absolute():
+        cache_dir = SKILL_DIR / cache_dir
+    return cache_dir
+
+
+def get_index_path(config: Dict) -> Path:
+    """Resolve the task index location"""
+    return get_cache_dir(config) / INDEX_FILENAME
+
+
+def open_task_ages(config: Dict) -> TaskAges:
+    return TaskAges(get_cache_dir(config) / AGES_FILENAME)
+
+
+def get_io_threads(config: Dict) -> int:
+    """Reader threads for diary files (scan.io_threads; 1 reads serially)"""
+    return config.get('scan', {}).get('io_threads', diary.DEFAULT_WORKERS)
+
+
+def load_config(config_path: Optional[Path] = None) -> Dict:
+    """Load skill config (defaults to config.json next to scripts/)"""
+    with open(config_path or SKILL_DIR / 'config.json') as f:
+        return json.load(f)
+
+
+def seen_date(task: Task, today: str) -> str:
+    """Date a task counts as seen: a diary note's own date, otherwise today"""
+    stem = Path(task.source_file).stem
+    return stem if DIARY_DATE_RE.match(stem) and stem < today else today
+
+
+def prepare_tasks(config: Dict, tasks: List[Task], now: datetime,
+                  dedupe: bool = True) -> List[Task]:
+    """Attach first-seen dates from the age index and drop cross-source duplicates"""
+    # Diary notes date their own tasks. Every copy is observed so a
+    # deduplicated task keeps its earliest date.
+    ages = open_task_ages(config)
+    today = now.strftime('%Y-%m-%d')
+    for task in tasks:
+        ages.observe(task.content_hash, seen_date(task, today))
+    ages.save()
     
-    # Load config
-    config_path = Path(__file__).parent.parent / 'config.json'
-    with open(config_path) as f:
-        config = json.load(f)
+    # Same task listed in several sources ("4. Задачи" and the diary)
+    if dedupe:
+        tasks = dedupe_tasks(tasks, task_score_key(config['priorities']['high_priority_projects'], now))
+    for task in tasks:
+        task.first_seen = ages.first_seen[task.content_hash]
+    
+    return tasks
+
+
+def rank_tasks(config: Dict, tasks: List[Task], limit: Optional[int], now: datetime) -> List[Task]:
+    """Prioritize, keeping only `limit` tasks (default max_tasks_per_day, 0 = all)"""
+    keywords = config['priorities']['high_priority_projects']
+    limit = config['priorities']['max_tasks_per_day'] if limit is None else limit
+    if limit > 0:
+        return select_top_tasks(tasks, keywords, limit, now=now)
+    return prioritize_tasks(tasks, keywords, now=now)
+
+
+def collect_tasks(config: Dict, limit: Optional[int] = None, now: Optional[datetime] = None,
+                  workers: int = 1, use_index: bool = True, rebuild_index: bool = False,
+                  with_stats: bool = False, dedupe: bool = True,
+                  cancel: Optional[threading.Event] = None) -> tuple:
+    """
+    Library entry point: scan, prioritize and limit tasks in-process.
+    Returns (tasks, summary) where summary holds total_found, index and stats.
+    Raises ScanCancelled once `cancel` is set.
+    """
+    # Single reference time for every overdue/deadline calculation in this run
+    now = now or datetime.now()
+    started = time.perf_counter()
     
     # Scan for tasks
-    tasks = scan_vault_for_tasks(
-        config['obsidian']['vault_path'],
-        config['obsidian']['tasks_sources']
-    )
+    index = TaskIndex(get_index_path(config), rebuild=rebuild_index) if use_index else None
+    try:
+        tasks = scan_vault_for_tasks(
+            config['obsidian']['vault_path'],
+            config['obsidian']['tasks_sources'],
+            index=index,
+            workers=workers,
+            io_threads=get_io_threads(config),
+            cancel=cancel
+        )
+    finally:
+        if index is not None:
+            index.close()
     
-    # Prioritize
-    tasks = prioritize_tasks(
-        tasks,
-        config['priorities']['high_priority_projects']
-    )
+    scanned = len(tasks)
+    scan_seconds = time.perf_counter() - started
+    
+    tasks = prepare_tasks(config, tasks, now, dedupe)
+    unique = len(tasks)
+    tasks = rank_tasks(config, tasks, limit, now)
+    
+    summary = {'total_found': len(tasks), 'duplicates_removed': scanned - unique}
+    if index is not None:
+        summary['index'] = index.stats
+    if with_stats:
+        summary['stats'] = {
+            'tasks_scanned': scanned,
+            'scan_seconds': round(scan_seconds, 3),
+            'peak_rss_kb': peak_rss_kb(),
+            'workers_peak_rss_kb': peak_rss_kb(children=True),
+        }
+    
+    return tasks, summary
+
+
+def stream_tasks(config: Dict, summary: Dict, limit: Optional[int] = None,
+                 now: Optional[datetime] = None, workers: int = 1, use_index: bool = True,
+                 rebuild_index: bool = False, with_stats: bool = False):
+    """
+    Yield tasks in scan order as each file is read from the index or parsed,
+    with first-seen dates. Nothing is ranked or deduplicated, so the first task
+    is out before the vault is scanned and only one file is held in memory.
+    Stops after `limit` tasks (None/0 = all); `summary` is filled at the end.
+    """
+    now = now or datetime.now()
+    started = time.perf_counter()
+    ages = open_task_ages(config)
+    today = now.strftime('%Y-%m-%d')
+    found = 0
+    
+    index = TaskIndex(get_index_path(config), rebuild=rebuild_index) if use_index else None
+    try:
+        files = iter_vault_files(
+            config['obsidian']['vault_path'],
+            config['obsidian']['tasks_sources'],
+            index=index,
+            workers=workers,
+            io_threads=get_io_threads(config)
+        )
+        tasks = (task for _, file_tasks in files for task in file_tasks)
+        for task in islice(tasks, limit or None):
+            task.first_seen = ages.observe(task.content_hash, seen_date(task, today))
+            found += 1
+            yield task
+        # Stopped at the limit: end the scan (the index is not pruned then)
+        files.close()
+    finally:
+        if index is not None:
+            index.close()
+        ages.save()
+    
+    summary.update(total_found=found, duplicates_removed=0)
+    if index is not None:
+        summary['index'] = index.stats
+    if with_stats:
+        summary['stats'] = {
+            'tasks_scanned': found,
+            'scan_seconds': round(time.perf_counter() - started, 3),
+            'peak_rss_kb': peak_rss_kb(),
+            'workers_peak_rss_kb': peak_rss_kb(children=True),
+        }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Parse tasks from Obsidian vault')
+    parser.add_argument('--config', type=Path, help='Path to config.json')
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='Drop the task index and re-parse every file')
+    parser.add_argument('--no-index', action='store_true',
+                        help='Scan without reading or updating the task index')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Parser processes for changed files (default: CPU count)')
+    parser.add_argument('--stats', action='store_true',
+                        help='Add scan timing and peak memory to the output')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json',
+                        help='json: one document; ndjson: one task per line + summary line')
+    parser.add_argument('--limit', type=int,
+                        help='Tasks to output (default: max_tasks_per_day, 0 = all)')
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='Keep identical tasks found in several sources')
+    parser.add_argument('--order', choices=['priority', 'scan'], default='priority',
+                        help='priority: ranked after the full scan; scan: streamed as files '
+                             'are read, unranked and not deduplicated (--limit defaults to all)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Keep the task set hot and serve it over a Unix socket')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help='Daemon: seconds between vault change checks')
+    args = parser.parse_args()
+    
+    if args.daemon:
+        import task_daemon
+        task_daemon.serve(load_config(args.config), args.workers, args.poll_interval,
+                          dedupe=not args.no_dedup)
+        return
+    
+    now = datetime.now()
+    if args.order == 'scan':
+        summary = {}
+        tasks = stream_tasks(
+            load_config(args.config),
+            summary,
+            limit=args.limit,
+            now=now,
+            workers=args.workers,
+            use_index=not args.no_index,
+            rebuild_index=args.rebuild_index,
+            with_stats=args.stats
+        )
+        if args.format == 'json':
+            tasks = list(tasks)
+    else:
+        tasks, summary = collect_tasks(
+            load_config(args.config),
+            limit=args.limit,
+            now=now,
+            workers=args.workers,
+            use_index=not args.no_index,
+            rebuild_index=args.rebuild_index,
+            with_stats=args.stats,
+            dedupe=not args.no_dedup
+        )
     
-    # Limit to max tasks per day
-    max_tasks = config['priorities']['max_tasks_per_day']
-    tasks = tasks[:max_tasks]
+    if args.format == 'ndjson':
+        # One task per line (as files are read with --order scan), then a summary record
+        for line in iter_ndjson(tasks, summary, now):
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        return
     
     # Output as JSON
     output = {
-        'total_found': len(tasks),
-        'tasks': [t.to_dict() for t in tasks]
+        'total_found': summary.pop('total_found'),
+        'tasks': [t.to_dict(now) for t in tasks]
     }
+    output.update(summary)
     
     print(json.dumps(output, ensure_ascii=False, indent=2))
 
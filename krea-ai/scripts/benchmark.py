@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for generate.py against a local stub of the Krea.ai job API.
+No API key or credits needed; nothing leaves localhost.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+import uuid
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import generate
+from http_client import HTTPClient, USER_AGENT
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+# Observed submit-to-completion ranges (references/models.md)
+MODEL_DURATIONS = {
+    "bfl/flux-1.1-pro-ultra": (10, 18),
+    "google/nano-banana-pro": (30, 42),
+}
+
+
+class StubKreaServer(ThreadingHTTPServer):
+    """
+    Minimal job API: POST /generate/... creates a job that completes after
+    `job_seconds` (a number, or a function of the request payload),
+    GET /jobs/{id} reports its status, GET /files/{name} serves `image_bytes`
+    of fake PNG data. HTTP/1.1 keep-alive, optionally over TLS; `connections`
+    counts accepted connections (= handshakes). With `retry_after` set,
+    "processing" answers carry that Retry-After header.
+    Files support Range/If-Range with an ETag and a Repr-Digest; `bandwidth`
+    throttles each connection (bytes/s) like a CDN edge, and `drops` makes the
+    next file responses cut off after `drop_at` bytes.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128  # many pollers connect at once
+
+    def __init__(
+        self,
+        job_seconds: Union[float, Callable[[Dict[str, Any]], float]] = 1.0,
+        image_bytes: int = 256 * 1024,
+        tls_context: Optional[ssl.SSLContext] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.tls_context = tls_context
+        self.connections = 0
+        self.job_seconds = job_seconds
+        self.retry_after = retry_after
+        self.image = PNG_HEADER + bytes(image_bytes - len(PNG_HEADER))
+        self.etag = f'"{hashlib.sha256(self.image).hexdigest()[:16]}"'
+        self.digest = base64.b64encode(hashlib.sha256(self.image).digest()).decode()
+        self.bandwidth: Optional[float] = None
+        self.drops = 0
+        self.drop_at = 0
+        self.bytes_sent = 0
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self) -> str:
+        scheme = "https" if self.tls_context else "http"
+        return f"{scheme}://127.0.0.1:{self.server_address[1]}"
+
+    def finish_request(self, request, client_address):
+        # Runs on the connection's own thread, so TLS handshakes do not serialize
+        with self.lock:
+            self.connections += 1
+        if self.tls_context:
+            try:
+                request = self.tls_context.wrap_socket(request, server_side=True)
+            except (ssl.SSLError, OSError):
+                return
+        super().finish_request(request, client_address)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this keep-alive
+    # responses stall on delayed ACKs (real servers set TCP_NODELAY too)
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status: int, body: Dict[str, Any], retry_after: Optional[float] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if retry_after is not None:
+            self.send_header("Retry-After", f"{retry_after:g}")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.startswith("/generate/") or not payload.get("prompt"):
+            self.send_json(400, {"error": "bad request"})
+            return
+        job_id = uuid.uuid4().hex
+        seconds = server.job_seconds(payload) if callable(server.job_seconds) else server.job_seconds
+        with server.lock:
+            server.requests += 1
+            server.jobs[job_id] = {
+                "done_at": time.monotonic() + seconds,
+                "images": payload.get("batchSize", 1),
+                "polls": 0,
+            }
+        self.send_json(200, {"job_id": job_id, "status": "queued"})
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        if self.path.startswith("/jobs/"):
+            job_id = self.path[len("/jobs/"):]
+            job = server.jobs.get(job_id)
+            if job is None:
+                self.send_json(404, {"error": "job not found"})
+                return
+            job["polls"] += 1
+            if time.monotonic() < job["done_at"]:
+                self.send_json(200, {"job_id": job_id, "status": "processing"}, server.retry_after)
+            else:
+                urls = [f"{server.base_url}/files/{job_id}_{i}.png" for i in range(job["images"])]
+                self.send_json(200, {"job_id": job_id, "status": "completed", "result": {"urls": urls}})
+        elif self.path.startswith("/files/"):
+            self.send_file()
+        else:
+            self.send_json(404, {"error": "not found"})
+
+
+    def send_file(self):
+        server = self.server
+        image = server.image
+        start, end = 0, len(image)
+        requested = self.headers.get("Range", "")
+        if_range = self.headers.get("If-Range")
+        if requested.startswith("bytes=") and (if_range is None or if_range == server.etag):
+            first, _, last = requested[len("bytes="):].partition("-")
+            start, end = int(first), min(int(last) + 1 if last else len(image), len(image))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(image)}")
+        else:
+            self.send_response(200)
+            self.send_header("Repr-Digest", f"sha-256=:{server.digest}:")
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", server.etag)
+        self.end_headers()
+
+        with server.lock:
+            drop = server.drops > 0
+            server.drops -= drop
+        body = memoryview(image)[start:end]
+        if drop:
+            body = body[:server.drop_at]
+            self.close_connection = True
+        step = 64 << 10
+        for offset in range(0, len(body), step):
+            started = time.monotonic()
+            piece = body[offset:offset + step]
+            try:
+                self.wfile.write(piece)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # client stopped reading (ranged split)
+                return
+            with server.lock:
+                server.bytes_sent += len(piece)
+            if server.bandwidth:
+                time.sleep(max(len(piece) / server.bandwidth - (time.monotonic() - started), 0))
+
+
+def self_signed_contexts(tmp: Path) -> Tuple[ssl.SSLContext, ssl.SSLContext]:
+    """Server and client TLS contexts for a throwaway 127.0.0.1 certificate (needs openssl)."""
+    key, cert = tmp / "stub.key", tmp / "stub.crt"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+         "-keyout", str(key), "-out", str(cert)],
+        check=True, capture_output=True,
+    )
+    server = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server.load_cert_chain(cert, key)
+    client = ssl.create_default_context(cafile=str(cert))
+    return server, client
+
+
+def bench_connections(args: argparse.Namespace) -> None:
+    """Per-request urlopen (one TLS handshake each) vs the keep-alive client"""
+    with tempfile.TemporaryDirectory() as tmp:
+        server_tls, client_tls = self_signed_contexts(Path(tmp))
+        with StubKreaServer(job_seconds=0, image_bytes=args.image_kb * 1024,
+                            tls_context=server_tls) as server:
+            job_id = generate.generate_image(
+                "stub:key", "Stub prompt", api_base=server.base_url,
+                client=HTTPClient(context=client_tls),
+            )
+            job_url = f"{server.base_url}/jobs/{job_id}"
+            image_url = f"{server.base_url}/files/{job_id}_0.png"
+            # A poll tick followed by a download, like the tail of every job
+            urls = [job_url if i % 2 == 0 else image_url for i in range(args.requests)]
+            print(f"Requests: {args.requests} over TLS (polls + {args.image_kb} KB downloads)")
+
+            def urlopen_each():
+                for url in urls:
+                    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+                    with urllib.request.urlopen(request, timeout=30, context=client_tls) as resp:
+                        resp.read()
+
+            client = HTTPClient(context=client_tls)
+
+            def pooled():
+                for url in urls:
+                    client.request("GET", url)
+
+            results = []
+            for name, func in (("urlopen per request", urlopen_each), ("keep-alive client", pooled)):
+                before = server.connections
+                started = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - started
+                results.append(elapsed)
+                print(f"  {name:20} {elapsed * 1000 / args.requests:7.2f} ms/request  "
+                      f"handshakes {server.connections - before}")
+            client.close()
+            print(f"  speedup: x{results[0] / results[1]:.1f}")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def bench_polling(args: argparse.Namespace) -> None:
+    """Completion detection latency and polls per job, fixed interval vs adaptive schedule"""
+    scale = args.scale
+    rng = random.Random(args.seed)
+    print(f"Jobs: {args.jobs} per model, time scale x{scale} (results in unscaled seconds)")
+
+    with StubKreaServer(lambda payload: payload["duration"]) as server:
+        client = HTTPClient()
+        for model, (low, high) in MODEL_DURATIONS.items():
+            durations = [rng.uniform(low, high) * scale for _ in range(args.jobs)]
+            print(f"  {model} (jobs take {low}-{high}s)")
+            strategies = (
+                (f"fixed {args.poll_interval:g}s", lambda: generate.PollSchedule(
+                    expected=0, max_interval=args.poll_interval * scale,
+                    first=args.poll_interval * scale, min_interval=args.poll_interval * scale, jitter=0)),
+                ("adaptive", lambda: generate.PollSchedule.for_model(model, args.poll_interval, scale)),
+            )
+            for name, make_schedule in strategies:
+
+                def run(duration):
+                    job_id = generate.make_request(
+                        f"{server.base_url}/generate/image/{model}", "stub:key", "POST",
+                        {"prompt": "Stub prompt", "duration": duration}, client,
+                    )["job_id"]
+                    generate.poll_job("stub:key", job_id, max_wait=120 * scale, api_base=server.base_url,
+                                      client=client, schedule=make_schedule())
+                    job = server.jobs[job_id]
+                    return (time.monotonic() - job["done_at"]) / scale, job["polls"]
+
+                with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+                    results = list(pool.map(run, durations))
+                latencies = [latency for latency, _ in results]
+                polls = sum(count for _, count in results) / len(results)
+                print(f"    {name:10} detection p50 {percentile(latencies, 0.5):5.2f}s  "
+                      f"p95 {percentile(latencies, 0.95):5.2f}s  polls/job {polls:4.1f}")
+        client.close()
+
+
+def bench_download(args: argparse.Namespace) -> None:
+    """Buffered sequential downloads vs streamed, concurrent and range-split ones"""
+    size = args.image_mb << 20
+    print(f"Job: {args.images} images x {args.image_mb} MB, "
+          f"{args.bandwidth_mb:g} MB/s per connection")
+
+    with StubKreaServer(0, size) as server, tempfile.TemporaryDirectory() as tmp:
+        server.bandwidth = args.bandwidth_mb * (1 << 20)
+        urls = [f"{server.base_url}/files/job_{i}.png" for i in range(args.images)]
+        paths = lambda name: [Path(tmp) / f"{name}_{i}.png" for i in range(args.images)]
+
+        def buffered(targets):
+            # What download_image did before: whole body in memory, one image after another
+            for url, path in zip(urls, targets):
+                request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+                with urllib.request.urlopen(request, timeout=60) as resp:
+                    path.write_bytes(resp.read())
+
+        def streamed(targets, segments):
+            client = HTTPClient()
+            with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+                list(pool.map(lambda pair: generate.download_image(*pair, client, segments),
+                              zip(urls, targets)))
+            client.close()
+
+        runs = (
+            ("buffered, sequential", lambda: buffered(paths("buffered"))),
+            ("streamed, concurrent", lambda: streamed(paths("streamed"), 1)),
+            (f"+ {args.segments} range segments", lambda: streamed(paths("segmented"), args.segments)),
+        )
+        baseline = None
+        for name, func in runs:
+            tracemalloc.start()
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            baseline = baseline or elapsed
+            print(f"  {name:22} {elapsed:6.2f}s (x{baseline / elapsed:.1f})  "
+                  f"peak memory {peak / (1 << 20):6.1f} MB")
+
+        intact = all(p.read_bytes() == server.image
+                     for name in ("buffered", "streamed", "segmented") for p in paths(name))
+        print(f"  files intact: {intact}")
+
+        # Connection cut at 70%: resume re-fetches only the missing blocks
+        server.bandwidth = None
+        server.drops, server.drop_at, server.bytes_sent = 1, size * 7 // 10, 0
+        target = Path(tmp) / "resumed.png"
+        generate.download_image(urls[0], target, HTTPClient())
+        print(f"  cut at 70%: {server.bytes_sent / size:.2f}x the file sent "
+              f"(restart would be 1.70x), intact {target.read_bytes() == server.image}")
+
+
+def bench_batch(args: argparse.Namespace) -> None:
+    """Wall time of a prompt batch, one job at a time vs --max-in-flight"""
+    jobs = [
+        {
+            "prompt": f"Stub prompt {i}",
+            "model": "bfl/flux-1.1-pro-ultra",
+            "width": 1024,
+            "height": 1024,
+            "batch_size": args.batch_size,
+            "seed": i,
+        }
+        for i in range(args.jobs)
+    ]
+    print(f"Jobs: {args.jobs} x {args.batch_size} images, "
+          f"stub job time {args.job_seconds}s, poll every {args.poll_interval}s")
+
+    # The stub's job time is the latency prior the poll schedule should expect
+    latency = {"bfl/flux-1.1-pro-ultra": args.job_seconds}
+    with StubKreaServer(args.job_seconds) as server, tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.dict(generate.MODEL_LATENCY, latency):
+        baseline = None
+        for in_flight in (1, args.max_in_flight):
+            output_dir = Path(tmp) / f"in-flight-{in_flight}"
+            client = HTTPClient()
+            started = time.perf_counter()
+            records = list(generate.run_batch(
+                "stub:key", jobs, output_dir, in_flight, args.poll_interval,
+                max_wait=60, api_base=server.base_url, client=client,
+            ))
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            client.close()
+
+            failed = [r for r in records if "error" in r]
+            files = [Path(p) for r in records for p in r.get("images", [])]
+            complete = all(p.read_bytes() == server.image for p in files)
+            print(f"  max in flight {in_flight:3}: {elapsed:6.2f}s (x{baseline / elapsed:.1f})  "
+                  f"records {len(records)}, failed {len(failed)}, "
+                  f"images {len(files)}, intact {complete}, "
+                  f"{client.stats['requests']} requests on {client.stats['connections']} connections")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="generate.py benchmarks (local stub API)")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    batch = sub.add_parser("batch", help="Batch throughput, sequential vs concurrent")
+    batch.add_argument("--jobs", type=int, default=12)
+    batch.add_argument("--batch-size", type=int, default=1)
+    batch.add_argument("--job-seconds", type=float, default=1.0)
+    batch.add_argument("--poll-interval", type=float, default=0.25)
+    batch.add_argument("--max-in-flight", type=int, default=generate.DEFAULT_MAX_IN_FLIGHT)
+    batch.set_defaults(func=bench_batch)
+
+    polling = sub.add_parser("polling", help="Detection latency, fixed vs adaptive polling")
+    polling.add_argument("--jobs", type=int, default=40)
+    polling.add_argument("--scale", type=float, default=0.05, help="Stub time per real second")
+    polling.add_argument("--poll-interval", type=float, default=5)
+    polling.add_argument("--seed", type=int, default=7)
+    polling.set_defaults(func=bench_polling)
+
+    downloading = sub.add_parser("download", help="Image download time and memory")
+    downloading.add_argument("--images", type=int, default=4)
+    downloading.add_argument("--image-mb", type=int, default=24)
+    downloading.add_argument("--bandwidth-mb", type=float, default=40, help="Per connection, MB/s")
+    downloading.add_argument("--segments", type=int, default=4)
+    downloading.set_defaults(func=bench_download)
+
+    connections = sub.add_parser("connections", help="TLS handshakes, urlopen vs keep-alive client")
+    connections.add_argument("--requests", type=int, default=200)
+    connections.add_argument("--image-kb", type=int, default=64)
+    connections.set_defaults(func=bench_connections)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Image downloads: streamed to <name>.part and renamed into place when complete.
+Progress is tracked per block (sha256 of every BLOCK_SIZE bytes) in
+<name>.part.json, so a retry or a rerun re-checks what is already on disk and
+fetches only the missing blocks (Range + If-Range). Large files can be split
+into parallel range requests.
+"""
+
+import base64
+import binascii
+import hashlib
+import http.client
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from http_client import HTTPClient
+
+BLOCK_SIZE = 1 << 20
+READ_SIZE = 64 << 10
+SPLIT_MIN_BYTES = 8 << 20   # smaller files are not worth extra range requests
+DOWNLOAD_ATTEMPTS = 3
+PART_SUFFIX = ".part"
+# Dropped connections and truncated bodies: retry, keeping verified blocks
+TRANSIENT_ERRORS = (OSError, http.client.HTTPException)
+DIGEST_ALGORITHMS = {"sha-256": "sha256", "sha-512": "sha512", "md5": "md5"}
+
+
+class DownloadError(RuntimeError):
+    """Download failed in a way a retry will not fix."""
+
+
+class _RemoteChanged(ConnectionError):
+    """Server answered a range request with the whole (possibly new) file."""
+
+
+def _b64_to_hex(value: str) -> Optional[str]:
+    try:
+        return base64.b64decode(value.strip().strip(":"), validate=True).hex()
+    except (binascii.Error, ValueError):
+        return None
+
+
+def parse_checksum(headers: Dict[str, str]) -> Optional[Tuple[str, str]]:
+    """Whole-file checksum announced by the server: (hashlib name, hex digest)."""
+    for header in ("repr-digest", "digest"):
+        for item in headers.get(header, "").split(","):
+            algorithm, _, encoded = item.strip().partition("=")
+            name = DIGEST_ALGORITHMS.get(algorithm.lower())
+            digest = name and _b64_to_hex(encoded)
+            if digest:
+                return name, digest
+    if headers.get("content-md5"):
+        digest = _b64_to_hex(headers["content-md5"])
+        if digest:
+            return "md5", digest
+    # Google Cloud Storage: x-goog-hash: crc32c=...,md5=...
+    for item in headers.get("x-goog-hash", "").split(","):
+        algorithm, _, encoded = item.strip().partition("=")
+        digest = algorithm == "md5" and _b64_to_hex(encoded)
+        if digest:
+            return "md5", digest
+    return None
+
+
+class DownloadState:
+    """What is known about the remote file and which blocks of the .part file are done."""
+
+    def __init__(
+        self,
+        url: str,
+        size: Optional[int] = None,
+        validator: Optional[str] = None,
+        ranges: bool = False,
+        checksum: Optional[Tuple[str, str]] = None,
+        blocks: Optional[Dict[int, str]] = None,
+    ):
+        self.url = url
+        self.size = size
+        self.validator = validator
+        self.ranges = ranges
+        self.checksum = checksum
+        self.blocks = blocks or {}
+
+    @classmethod
+    def from_headers(cls, url: str, headers: Dict[str, str]) -> "DownloadState":
+        identity = headers.get("content-encoding", "identity").lower() == "identity"
+        length = headers.get("content-length", "")
+        size = int(length) if identity and length.isdigit() else None
+        validator = headers.get("etag") or headers.get("last-modified")
+        if validator and validator.startswith("W/"):
+            validator = None  # If-Range needs a strong validator
+        ranges = headers.get("accept-ranges", "").lower() == "bytes" and size is not None
+        return cls(url, size, validator, ranges and validator is not None, parse_checksum(headers))
+
+    @property
+    def block_count(self) -> int:
+        return -(-self.size // BLOCK_SIZE) if self.size else 0
+
+    def block_end(self, index: int) -> int:
+        end = (index + 1) * BLOCK_SIZE
+        return min(end, self.size) if self.size is not None else end
+
+    def missing_spans(self, parts: int = 1) -> List[Tuple[int, int]]:
+        """Byte spans [start, end) of missing blocks, long runs cut into about `parts` pieces."""
+        runs = []
+        for index in range(self.block_count):
+            if index in self.blocks:
+                continue
+            if runs and runs[-1][1] == index:
+                runs[-1][1] = index + 1
+            else:
+                runs.append([index, index + 1])
+
+        total = sum(end - start for start, end in runs)
+        step = max(-(-total // max(parts, 1)), 1)
+        spans = []
+        for start, end in runs:
+            for first in range(start, end, step):
+                spans.append((first * BLOCK_SIZE, self.block_end(min(first + step, end) - 1)))
+        return spans
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "size": self.size,
+            "validator": self.validator,
+            "ranges": self.ranges,
+            "checksum": list(self.checksum) if self.checksum else None,
+            "block_size": BLOCK_SIZE,
+            "blocks": {str(index): digest for index, digest in sorted(self.blocks.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DownloadState":
+        if data.get("block_size") != BLOCK_SIZE:
+            raise ValueError("block size changed")
+        return cls(
+            data["url"],
+            data.get("size"),
+            data.get("validator"),
+            bool(data.get("ranges")),
+            tuple(data["checksum"]) if data.get("checksum") else None,
+            {int(index): digest for index, digest in data.get("blocks", {}).items()},
+        )
+
+
+def _file_digest(path: Path, algorithm: str) -> str:
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Download:
+    """One file: .part data, .part.json state, writers on any number of threads."""
+
+    def __init__(self, url: str, output_path: Path, client: HTTPClient, segments: int = 1):
+        self.url = url
+        self.output_path = output_path
+        self.part_path = output_path.with_name(output_path.name + PART_SUFFIX)
+        self.state_path = self.part_path.with_name(self.part_path.name + ".json")
+        self.client = client
+        self.segments = max(segments, 1)
+        self.lock = threading.Lock()
+        self.state: Optional[DownloadState] = None
+        self.bytes_fetched = 0
+
+    def load_state(self) -> Optional[DownloadState]:
+        """Saved state with every block re-verified against the .part file; None to start over."""
+        try:
+            state = DownloadState.from_dict(json.loads(self.state_path.read_text()))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if state.url != self.url or not state.ranges or not self.part_path.exists():
+            return None
+
+        with open(self.part_path, "rb") as f:
+            for index, digest in list(state.blocks.items()):
+                f.seek(index * BLOCK_SIZE)
+                data = f.read(state.block_end(index) - index * BLOCK_SIZE)
+                if hashlib.sha256(data).hexdigest() != digest:
+                    del state.blocks[index]
+        return state
+
+    def save_state(self) -> None:
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.state.to_dict()))
+        os.replace(tmp_path, self.state_path)
+
+    def clear(self) -> None:
+        for path in (self.part_path, self.state_path):
+            path.unlink(missing_ok=True)
+
+    def write_span(self, response: http.client.HTTPResponse, start: int, end: Optional[int]) -> None:
+        """Copy response bytes into .part at [start, end); end=None reads to EOF."""
+        state = self.state
+        offset, index = start, start // BLOCK_SIZE
+        block_end = state.block_end(index)
+        digest = hashlib.sha256()
+
+        with open(self.part_path, "r+b") as f:
+            f.seek(start)
+            while end is None or offset < end:
+                chunk = response.read(READ_SIZE if end is None else min(READ_SIZE, end - offset))
+                if not chunk:
+                    break
+                view = memoryview(chunk)
+                while view:
+                    piece = view[:block_end - offset]
+                    f.write(piece)
+                    digest.update(piece)
+                    offset += len(piece)
+                    view = view[len(piece):]
+                    if offset == block_end:
+                        f.flush()
+                        self.block_done(index, digest.hexdigest(), BLOCK_SIZE)
+                        index, block_end, digest = index + 1, state.block_end(index + 1), hashlib.sha256()
+
+            if end is not None and offset < end:
+                raise ConnectionError(f"Connection closed at byte {offset} of {end}: {self.url}")
+            if end is None:
+                # Unknown length: the size is whatever arrived
+                state.size = offset
+                if offset % BLOCK_SIZE:
+                    f.flush()
+                    self.block_done(index, digest.hexdigest(), offset % BLOCK_SIZE)
+
+    def block_done(self, index: int, digest: str, length: int) -> None:
+        with self.lock:
+            self.state.blocks[index] = digest
+            self.bytes_fetched += length
+            if self.state.ranges:
+                self.save_state()
+
+    def fetch_span(self, span: Tuple[int, int]) -> None:
+        start, end = span
+        headers = {"Range": f"bytes={start}-{end - 1}"}
+        if self.state.validator:
+            headers["If-Range"] = self.state.validator
+        with self.client.stream("GET", self.url, headers=headers) as response:
+            if response.status == 200:
+                raise _RemoteChanged()
+            if response.status != 206:
+                raise DownloadError(f"Download failed ({response.status}): {self.url}")
+            if not (response.getheader("Content-Range") or "").startswith(f"bytes {start}-"):
+                raise DownloadError(f"Unexpected Content-Range for bytes {start}-: {self.url}")
+            self.write_span(response, start, end)
+
+    def fetch_spans(self, spans: List[Tuple[int, int]],
+                    first: Optional[http.client.HTTPResponse] = None) -> None:
+        """Spans in parallel; the first one may be read from an already open full response."""
+        if not spans:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.segments, len(spans))) as pool:
+            rest = spans[1:] if first is not None else spans
+            futures = [pool.submit(self.fetch_span, span) for span in rest]
+            if first is not None:
+                self.write_span(first, *spans[0])
+            for future in futures:
+                future.result()
+
+    def start(self) -> None:
+        """Fresh download: one GET, split into ranges if the file is large enough."""
+        self.clear()
+        with self.client.stream("GET", self.url) as response:
+            if response.status >= 400:
+                raise DownloadError(f"Download failed ({response.status}): {self.url}")
+            headers = {key.lower(): value for key, value in response.getheaders()}
+            self.state = DownloadState.from_headers(self.url, headers)
+            with open(self.part_path, "wb") as f:
+                if self.state.size:
+                    f.truncate(self.state.size)
+            if self.state.ranges:
+                self.save_state()
+
+            if self.state.size is None:
+                self.write_span(response, 0, None)
+            elif self.segments > 1 and self.state.ranges and self.state.size >= SPLIT_MIN_BYTES:
+                self.fetch_spans(self.state.missing_spans(self.segments), first=response)
+            else:
+                self.write_span(response, 0, self.state.size)
+
+    def run(self) -> None:
+        self.state = self.load_state()
+        if self.state is None:
+            self.start()
+        else:
+            done = len(self.state.blocks)
+            print(f"[RESUME] {self.output_path.name}: {done}/{self.state.block_count} blocks verified",
+                  file=sys.stderr)
+            try:
+                self.fetch_spans(self.state.missing_spans(self.segments))
+            except _RemoteChanged:
+                self.start()
+        self.finish()
+
+    def finish(self) -> None:
+        state = self.state
+        if self.part_path.stat().st_size != state.size or len(state.blocks) != state.block_count:
+            raise ConnectionError(f"Incomplete download: {self.url}")
+        if state.checksum:
+            algorithm, expected = state.checksum
+            if _file_digest(self.part_path, algorithm) != expected:
+                self.clear()
+                raise DownloadError(f"Checksum mismatch ({algorithm}): {self.url}")
+        os.replace(self.part_path, self.output_path)
+        self.state_path.unlink(missing_ok=True)
+
+
+def download_file(
+    url: str,
+    output_path: Path,
+    client: HTTPClient,
+    segments: int = 1,
+    attempts: int = DOWNLOAD_ATTEMPTS,
+) -> Download:
+    """
+    Download url to output_path. Interrupted transfers are retried from the
+    verified blocks; output_path only ever appears complete.
+    """
+    download = Download(url, Path(output_path), client, segments)
+    for attempt in range(1, attempts + 1):
+        try:
+            download.run()
+            return download
+        except TRANSIENT_ERRORS as e:
+            if attempt == attempts:
+                raise
+            print(f"[RETRY] {output_path.name} ({attempt}/{attempts - 1}): {e}", file=sys.stderr)
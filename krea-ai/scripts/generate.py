@@ -7,39 +7,97 @@ Generates high-quality images using Krea.ai API with job-based polling.
 import argparse
 import json
 import os
+import random
+import shutil
 import sys
 import time
-import urllib.error
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Any, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
+from download import download_file
+from http_client import HTTPClient, Response
+from result_cache import (
+    DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResultCache, cache_key, is_deterministic,
+)
 
-def make_request(
+API_BASE = os.environ.get("KREA_API_BASE", "https://api.krea.ai").rstrip("/")
+DEFAULT_MAX_IN_FLIGHT = 4
+ENDPOINTS = {
+    "bfl/flux-1.1-pro-ultra": "generate/image/bfl/flux-1.1-pro-ultra",
+    "google/nano-banana-pro": "generate/image/google/nano-banana-pro",
+}
+MAX_PARALLEL_DOWNLOADS = 4
+
+# Shared by every request of the process: one pool of keep-alive connections per
+# host, used by all worker threads
+CLIENT = HTTPClient()
+
+# Typical seconds from submit to completion (references/models.md)
+MODEL_LATENCY = {
+    "bfl/flux-1.1-pro-ultra": 10,
+    "google/nano-banana-pro": 35,
+}
+DEFAULT_LATENCY = 20
+FIRST_POLL = 1.0          # quick check right after submit
+MIN_POLL_INTERVAL = 1.0   # backoff starts here once the expected latency is near
+POLL_BACKOFF = 1.25
+POLL_JITTER = 0.2         # +-20% on every delay
+PRIOR_FRACTION = 0.8      # skip ahead to 80% of the expected latency
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Batch file keys (JSONL) -> generate_image arguments
+JOB_KEYS = {
+    "prompt": "prompt",
+    "model": "model",
+    "width": "width",
+    "height": "height",
+    "batch_size": "batch_size",
+    "batchSize": "batch_size",
+    "seed": "seed",
+    "raw": "raw",
+    "aspect_ratio": "aspect_ratio",
+    "aspectRatio": "aspect_ratio",
+    "resolution": "resolution",
+    "image_urls": "image_urls",
+    "imageUrls": "image_urls",
+}
+
+
+def api_request(
     url: str,
     api_key: str,
     method: str = "GET",
-    data: Optional[Dict[str, Any]] = None
-) -> Dict[str, Any]:
-    """Make HTTP request to Krea.ai API."""
+    data: Optional[Dict[str, Any]] = None,
+    client: Optional[HTTPClient] = None,
+) -> Response:
+    """Raw Krea.ai API response (status, headers, body), errors included."""
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
     
     body = json.dumps(data).encode("utf-8") if data else None
-    req = urllib.request.Request(url, method=method, headers=headers, data=body)
-    
-    try:
-        with urllib.request.urlopen(req, timeout=120) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        payload = e.read().decode("utf-8", errors="replace")
-        raise RuntimeError(f"Krea.ai API failed ({e.code}): {payload}") from e
+    return (client or CLIENT).request(method, url, headers=headers, body=body)
 
 
-def generate_image(
+def make_request(
+    url: str,
     api_key: str,
+    method: str = "GET",
+    data: Optional[Dict[str, Any]] = None,
+    client: Optional[HTTPClient] = None,
+) -> Dict[str, Any]:
+    """Make HTTP request to Krea.ai API."""
+    response = api_request(url, api_key, method, data, client)
+    if response.status >= 400:
+        raise RuntimeError(f"Krea.ai API failed ({response.status}): {response.text}")
+    return json.loads(response.data.decode("utf-8"))
+
+
+def build_payload(
     prompt: str,
     model: str = "bfl/flux-1.1-pro-ultra",
     width: int = 1536,
@@ -50,21 +108,14 @@ def generate_image(
     aspect_ratio: Optional[str] = None,
     resolution: Optional[str] = None,
     image_urls: Optional[list] = None,
-) -> str:
+) -> Tuple[str, Dict[str, Any]]:
     """
-    Submit image generation job to Krea.ai.
-    Returns job_id for polling.
+    Endpoint and JSON payload for a generation request.
+    Only the fields the model uses are included.
     """
-    endpoint_map = {
-        "bfl/flux-1.1-pro-ultra": "generate/image/bfl/flux-1.1-pro-ultra",
-        "google/nano-banana-pro": "generate/image/google/nano-banana-pro",
-    }
-    
-    endpoint = endpoint_map.get(model)
+    endpoint = ENDPOINTS.get(model)
     if not endpoint:
-        raise ValueError(f"Unknown model: {model}. Supported: {list(endpoint_map.keys())}")
-    
-    url = f"https://api.krea.ai/{endpoint}"
+        raise ValueError(f"Unknown model: {model}. Supported: {list(ENDPOINTS.keys())}")
     
     # Build payload based on model
     if model == "google/nano-banana-pro":
@@ -90,8 +141,35 @@ def generate_image(
         if raw:
             payload["raw"] = True
     
+    return endpoint, payload
+
+
+def generate_image(
+    api_key: str,
+    prompt: str,
+    model: str = "bfl/flux-1.1-pro-ultra",
+    width: int = 1536,
+    height: int = 1024,
+    batch_size: int = 1,
+    seed: Optional[int] = None,
+    raw: bool = True,
+    aspect_ratio: Optional[str] = None,
+    resolution: Optional[str] = None,
+    image_urls: Optional[list] = None,
+    api_base: str = API_BASE,
+    client: Optional[HTTPClient] = None,
+) -> str:
+    """
+    Submit image generation job to Krea.ai.
+    Returns job_id for polling.
+    """
+    endpoint, payload = build_payload(
+        prompt, model, width, height, batch_size, seed, raw, aspect_ratio, resolution, image_urls
+    )
+    url = f"{api_base}/{endpoint}"
+    
     print(f"[SUBMIT] Model: {model}, Size: {width}x{height}, Batch: {batch_size}", file=sys.stderr)
-    response = make_request(url, api_key, method="POST", data=payload)
+    response = make_request(url, api_key, method="POST", data=payload, client=client)
     
     job_id = response.get("job_id")
     if not job_id:
@@ -101,45 +179,311 @@ def generate_image(
     return job_id
 
 
-def poll_job(api_key: str, job_id: str, poll_interval: int = 5, max_wait: int = 300) -> Dict[str, Any]:
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (delta seconds or HTTP date) -> seconds from now."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class PollSchedule:
+    """
+    Delays between job polls: a quick first check, then a jump to just before
+    the model's expected latency, then exponential backoff up to max_interval.
+    Every delay is jittered so concurrent pollers drift apart, and never
+    shorter than the server's Retry-After.
+    """
+    
+    def __init__(
+        self,
+        expected: float = DEFAULT_LATENCY,
+        max_interval: float = 5,
+        first: float = FIRST_POLL,
+        min_interval: float = MIN_POLL_INTERVAL,
+        jitter: float = POLL_JITTER,
+        rng: Optional[random.Random] = None,
+    ):
+        self.expected = expected
+        self.max_interval = max(max_interval, min_interval)
+        self.first = first
+        self.interval = min_interval
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.polls = 0
+    
+    @classmethod
+    def for_model(cls, model: str, max_interval: float = 5, scale: float = 1.0) -> "PollSchedule":
+        """Schedule from the model's latency prior; scale < 1 compresses time (benchmarks)."""
+        return cls(
+            expected=MODEL_LATENCY.get(model, DEFAULT_LATENCY) * scale,
+            max_interval=max_interval * scale,
+            first=FIRST_POLL * scale,
+            min_interval=MIN_POLL_INTERVAL * scale,
+        )
+    
+    def next_delay(self, elapsed: float, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before the next poll, `elapsed` seconds after submit."""
+        self.polls += 1
+        early = self.expected * PRIOR_FRACTION
+        if self.polls == 1:
+            delay = self.first
+        elif elapsed < early:
+            delay = early - elapsed
+        else:
+            delay = self.interval
+            self.interval = min(self.interval * POLL_BACKOFF, self.max_interval)
+        
+        delay *= self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+def poll_job(
+    api_key: str,
+    job_id: str,
+    poll_interval: float = 5,
+    max_wait: float = 300,
+    api_base: str = API_BASE,
+    client: Optional[HTTPClient] = None,
+    model: Optional[str] = None,
+    schedule: Optional[PollSchedule] = None,
+) -> Dict[str, Any]:
     """
     Poll job status until completion or timeout.
     Returns final job response with image URLs.
+    poll_interval caps the backoff; max_wait is measured on the monotonic clock.
     """
-    url = f"https://api.krea.ai/jobs/{job_id}"
-    elapsed = 0
+    url = f"{api_base}/jobs/{job_id}"
+    schedule = schedule or PollSchedule.for_model(model or "", poll_interval)
+    started = time.monotonic()
+    deadline = started + max_wait
+    retry_after = None
     
-    while elapsed < max_wait:
-        response = make_request(url, api_key, method="GET")
-        status = response.get("status", "unknown")
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            raise TimeoutError(f"Job did not complete within {max_wait}s")
+        time.sleep(min(schedule.next_delay(now - started, retry_after), deadline - now))
         
-        if status == "completed":
-            print(f"[COMPLETE] Job finished in {elapsed}s", file=sys.stderr)
-            return response
-        elif status in ["failed", "cancelled"]:
-            raise RuntimeError(f"Job {status}: {response}")
+        response = api_request(url, api_key, method="GET", client=client)
+        retry_after = parse_retry_after(response.headers.get("retry-after"))
+        elapsed = time.monotonic() - started
         
-        print(f"[POLL] Status: {status}, elapsed: {elapsed}s", file=sys.stderr)
-        time.sleep(poll_interval)
-        elapsed += poll_interval
-    
-    raise TimeoutError(f"Job did not complete within {max_wait}s")
+        if response.status in RETRY_STATUSES:
+            # Rate limited or gateway hiccup: keep polling, no sooner than asked
+            status = f"HTTP {response.status}"
+        elif response.status >= 400:
+            raise RuntimeError(f"Krea.ai API failed ({response.status}): {response.text}")
+        else:
+            job = json.loads(response.data.decode("utf-8"))
+            status = job.get("status", "unknown")
+            if status == "completed":
+                print(f"[COMPLETE] Job finished in {elapsed:.1f}s", file=sys.stderr)
+                return job
+            elif status in ["failed", "cancelled"]:
+                raise RuntimeError(f"Job {status}: {job}")
+        
+        print(f"[POLL] Status: {status}, elapsed: {elapsed:.1f}s", file=sys.stderr)
+
+
+class NoImagesError(RuntimeError):
+    """Job completed without image URLs."""
+
 
+def extract_image_urls(result: Dict[str, Any]) -> List[str]:
+    """Image URLs from a completed job (`result.urls`, older responses use `images`)."""
+    urls = (result.get("result") or {}).get("urls")
+    return list(urls or result.get("images") or [])
 
-def download_image(url: str, output_path: Path) -> None:
-    """Download image from URL to local file."""
+
+def download_image(
+    url: str,
+    output_path: Path,
+    client: Optional[HTTPClient] = None,
+    segments: int = 1,
+) -> None:
+    """Download image from URL to local file (streamed, resumable, see download.py)."""
     print(f"[DOWNLOAD] {url} -> {output_path}", file=sys.stderr)
+    download_file(url, output_path, client or CLIENT, segments)
+    print(f"[SAVED] {output_path}", file=sys.stderr)
+
+
+def run_job(
+    api_key: str,
+    job: Dict[str, Any],
+    output_dir: Path,
+    poll_interval: float = 5,
+    max_wait: float = 300,
+    api_base: str = API_BASE,
+    client: Optional[HTTPClient] = None,
+    segments: int = 1,
+    cache: Optional[ResultCache] = None,
+) -> Dict[str, Any]:
+    """
+    Submit one job, wait for it and download its images. Returns metadata.
+    Deterministic requests are served from / stored in `cache` when given.
+    """
+    key = None
+    if cache is not None:
+        endpoint, payload = build_payload(**job)
+        if is_deterministic(job["model"], payload):
+            key = cache_key(endpoint, payload)
+            cached = cache.get(key)
+            if cached is not None:
+                hit = copy_cached_result(cached, job, output_dir)
+                if hit is not None:
+                    return hit
+    
+    job_id = generate_image(api_key=api_key, api_base=api_base, client=client, **job)
+    result = poll_job(
+        api_key=api_key,
+        job_id=job_id,
+        poll_interval=poll_interval,
+        max_wait=max_wait,
+        api_base=api_base,
+        client=client,
+        model=job["model"],
+    )
     
-    req = urllib.request.Request(url)
-    with urllib.request.urlopen(req, timeout=60) as resp:
-        output_path.write_bytes(resp.read())
+    images = extract_image_urls(result)
+    if not images:
+        raise NoImagesError(f"No images in response: {result}")
     
-    print(f"[SAVED] {output_path}", file=sys.stderr)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = [output_dir / f"{job_id}_{idx:02d}.png" for idx in range(len(images))]
+    with ThreadPoolExecutor(max_workers=min(len(images), MAX_PARALLEL_DOWNLOADS)) as pool:
+        downloads = [
+            pool.submit(download_image, img_url, output_path, client, segments)
+            for img_url, output_path in zip(images, paths)
+        ]
+        for future in downloads:
+            future.result()
+    
+    metadata = {
+        "job_id": job_id,
+        "model": job["model"],
+        "prompt": job["prompt"],
+        "images": [str(path) for path in paths],
+        "credits_used": result.get("credits_used", "unknown"),
+    }
+    if key is not None:
+        try:
+            cache.put(key, metadata, paths)
+        except OSError as e:
+            print(f"Warning: result not cached: {e}", file=sys.stderr)
+    return metadata
+
+
+def copy_cached_result(cached: Dict[str, Any], job: Dict[str, Any], output_dir: Path) -> Optional[Dict[str, Any]]:
+    """
+    Metadata for a cache hit, with the cached images copied into output_dir.
+    None if the entry vanished meanwhile (evicted by another process): a miss.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    try:
+        for idx, image in enumerate(cached["images"]):
+            path = output_dir / f"{cached['job_id']}_{idx:02d}{Path(image).suffix}"
+            shutil.copyfile(image, path)
+            paths.append(path)
+    except OSError as e:
+        print(f"[CACHE] Entry for job {cached['job_id']} is gone ({e}), generating", file=sys.stderr)
+        for path in paths:
+            path.unlink(missing_ok=True)
+        return None
+    print(f"[CACHE] Hit for job {cached['job_id']}, no credits used", file=sys.stderr)
+    return {
+        "job_id": cached["job_id"],
+        "model": job["model"],
+        "prompt": job["prompt"],
+        "images": [str(path) for path in paths],
+        "credits_used": 0,
+        "cached": True,
+    }
+
+
+def load_batch_file(path: Path, defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Jobs from a batch file: one prompt per line, or a JSON object per line
+    with "prompt" and optional model/width/height/batch_size/seed/raw/
+    aspect_ratio/resolution/image_urls overriding the CLI defaults.
+    Blank lines and lines starting with # are skipped.
+    """
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            job = dict(defaults)
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON: {e}") from e
+                unknown = set(record) - set(JOB_KEYS)
+                if unknown:
+                    raise ValueError(f"{path}:{line_number}: unknown keys {sorted(unknown)}")
+                job.update((JOB_KEYS[key], value) for key, value in record.items())
+            else:
+                job["prompt"] = line
+            if not job.get("prompt"):
+                raise ValueError(f"{path}:{line_number}: missing prompt")
+            jobs.append(job)
+    return jobs
+
+
+def run_batch(
+    api_key: str,
+    jobs: List[Dict[str, Any]],
+    output_dir: Path,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    poll_interval: float = 5,
+    max_wait: float = 300,
+    api_base: str = API_BASE,
+    client: Optional[HTTPClient] = None,
+    segments: int = 1,
+    cache: Optional[ResultCache] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run jobs concurrently, at most max_in_flight submitted-but-unfinished at a time.
+    Yields one metadata record per job in completion order; failures carry "error".
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        futures = {
+            pool.submit(
+                run_job, api_key, job, output_dir, poll_interval, max_wait, api_base, client,
+                segments, cache,
+            ): (index, job)
+            for index, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            index, job = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"[FAILED] #{index}: {e}", file=sys.stderr)
+                record = {"model": job["model"], "prompt": job["prompt"], "error": str(e)}
+            yield {"index": index, **record}
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Generate images via Krea.ai API")
-    parser.add_argument("--prompt", required=True, help="Image generation prompt")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--prompt", help="Image generation prompt")
+    source.add_argument("--batch-file", type=Path,
+                        help="Prompts file: one prompt per line or JSONL with per-job options")
     parser.add_argument("--model", default="bfl/flux-1.1-pro-ultra", help="Model name")
     parser.add_argument("--width", type=int, default=1536, help="Image width")
     parser.add_argument("--height", type=int, default=1024, help="Image height")
@@ -150,8 +494,20 @@ def main() -> int:
     parser.add_argument("--resolution", help="Resolution (1K/2K/4K) for Nano Banana Pro")
     parser.add_argument("--image-url", action="append", help="Reference image URL (can specify multiple)")
     parser.add_argument("--output-dir", default="./output", help="Output directory")
-    parser.add_argument("--poll-interval", type=int, default=5, help="Poll interval (seconds)")
-    parser.add_argument("--max-wait", type=int, default=300, help="Max wait time (seconds)")
+    parser.add_argument("--poll-interval", type=float, default=5,
+                        help="Max interval between polls (seconds)")
+    parser.add_argument("--max-wait", type=float, default=300, help="Max wait time (seconds)")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Batch mode: jobs running at the same time")
+    parser.add_argument("--download-segments", type=int, default=1,
+                        help="Parallel HTTP range requests per large image (8 MB+)")
+    parser.add_argument("--api-base", default=API_BASE, help="API base URL (env KREA_API_BASE)")
+    parser.add_argument("--cache-dir", type=Path,
+                        default=Path(os.environ.get("KREA_CACHE_DIR") or DEFAULT_CACHE_DIR),
+                        help="Result cache for seeded Flux requests (env KREA_CACHE_DIR)")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES >> 20,
+                        help="Result cache size limit, least recently used evicted first")
+    parser.add_argument("--no-cache", action="store_true", help="Always generate, never store results")
     
     args = parser.parse_args()
     
@@ -160,52 +516,46 @@ def main() -> int:
         print("Error: KREA_API_KEY environment variable not set", file=sys.stderr)
         return 2
     
-    # Submit job
-    job_id = generate_image(
-        api_key=api_key,
-        prompt=args.prompt,
-        model=args.model,
-        width=args.width,
-        height=args.height,
-        batch_size=args.batch_size,
-        seed=args.seed,
-        raw=not args.no_raw,
-        aspect_ratio=args.aspect_ratio,
-        resolution=args.resolution,
-        image_urls=args.image_url,
-    )
-    
-    # Poll until complete
-    result = poll_job(
-        api_key=api_key,
-        job_id=job_id,
-        poll_interval=args.poll_interval,
-        max_wait=args.max_wait,
-    )
-    
-    # Download images
+    defaults = {
+        "prompt": args.prompt,
+        "model": args.model,
+        "width": args.width,
+        "height": args.height,
+        "batch_size": args.batch_size,
+        "seed": args.seed,
+        "raw": not args.no_raw,
+        "aspect_ratio": args.aspect_ratio,
+        "resolution": args.resolution,
+        "image_urls": args.image_url,
+    }
     output_dir = Path(args.output_dir).expanduser()
-    output_dir.mkdir(parents=True, exist_ok=True)
+    api_base = args.api_base.rstrip("/")
+    cache = None if args.no_cache else ResultCache(args.cache_dir.expanduser(), args.cache_max_mb << 20)
     
-    images = result.get("images", [])
-    if not images:
-        print(f"Warning: No images in response: {result}", file=sys.stderr)
-        return 1
+    if args.batch_file:
+        try:
+            jobs = load_batch_file(args.batch_file, defaults)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        
+        print(f"[BATCH] {len(jobs)} jobs, max in flight: {args.max_in_flight}", file=sys.stderr)
+        failed = 0
+        # One JSON line per job as soon as it finishes
+        for record in run_batch(api_key, jobs, output_dir, args.max_in_flight, args.poll_interval,
+                                args.max_wait, api_base, segments=args.download_segments, cache=cache):
+            failed += "error" in record
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+        return 1 if failed else 0
     
-    for idx, img_url in enumerate(images):
-        filename = f"{job_id}_{idx:02d}.png"
-        output_path = output_dir / filename
-        download_image(img_url, output_path)
+    try:
+        metadata = run_job(api_key, defaults, output_dir, args.poll_interval, args.max_wait, api_base,
+                           segments=args.download_segments, cache=cache)
+    except NoImagesError as e:
+        print(f"Warning: {e}", file=sys.stderr)
+        return 1
     
     # Print metadata
-    metadata = {
-        "job_id": job_id,
-        "model": args.model,
-        "prompt": args.prompt,
-        "images": [str(output_dir / f"{job_id}_{i:02d}.png") for i in range(len(images))],
-        "credits_used": result.get("credits_used", "unknown"),
-    }
-    
     print(json.dumps(metadata, indent=2))
     return 0
 
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Keep-alive HTTP client shared by submit, poll and download.
+Idle http.client connections are pooled per (scheme, host) and checked out
+for one request at a time, so a job's poll ticks and image downloads reuse
+TCP+TLS sessions instead of handshaking for every request.
+HTTP(S)_PROXY / NO_PROXY are honoured like urllib does: https goes through a
+CONNECT tunnel, plain http is sent to the proxy with the absolute URL.
+"""
+
+import base64
+import http.client
+import select
+import ssl
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import SplitResult, unquote, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass_environment
+
+USER_AGENT = "Mozilla/5.0 (compatible; krea-ai-skill/1.0)"
+DEFAULT_TIMEOUT = 120
+MAX_REDIRECTS = 5
+MAX_IDLE_PER_HOST = 8
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# A pooled connection the server already closed fails like this on reuse
+STALE_ERRORS = (ConnectionError, http.client.BadStatusLine)
+# Safe to send again when a reused connection fails: the server may already
+# have acted on a POST (a second submit would start and bill a second job)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+
+
+class Response:
+    """Fully read response."""
+
+    __slots__ = ("status", "headers", "data")
+
+    def __init__(self, status: int, headers: Dict[str, str], data: bytes):
+        self.status = status
+        self.headers = headers
+        self.data = data
+
+    @property
+    def text(self) -> str:
+        return self.data.decode("utf-8", errors="replace")
+
+
+class HTTPClient:
+    """
+    Pooled HTTP/1.1 client, safe to share between threads: each request takes
+    an idle connection to its host (or opens one) and returns it once the
+    response has been read to the end.
+    """
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        context: Optional[ssl.SSLContext] = None,
+        user_agent: str = USER_AGENT,
+        proxies: Optional[Dict[str, str]] = None,
+    ):
+        self.timeout = timeout
+        self.context = context or ssl.create_default_context()
+        self.user_agent = user_agent
+        # scheme -> proxy URL, plus "no" for the bypass list (urllib format)
+        self.proxies = getproxies() if proxies is None else proxies
+        self._routes: Dict[Tuple[str, str], Optional[SplitResult]] = {}
+        self._idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._open = set()
+        self.stats = {"requests": 0, "connections": 0, "reused": 0}
+
+    def _proxy(self, key: Tuple[str, str]) -> Optional[SplitResult]:
+        """Proxy for (scheme, host), None to connect directly."""
+        if key not in self._routes:
+            scheme, netloc = key
+            proxy_url = self.proxies.get(scheme)
+            host = urlsplit(f"//{netloc}").hostname or ""
+            if not proxy_url or proxy_bypass_environment(host, self.proxies):
+                self._routes[key] = None
+            else:
+                proxy = urlsplit(proxy_url if "://" in proxy_url else f"http://{proxy_url}")
+                if proxy.scheme != "http" or not proxy.hostname:
+                    raise ValueError(f"Unsupported proxy: {proxy_url}")
+                self._routes[key] = proxy
+        return self._routes[key]
+
+    @staticmethod
+    def _proxy_headers(proxy: SplitResult) -> Dict[str, str]:
+        if proxy.username is None:
+            return {}
+        credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+        return {"Proxy-Authorization": "Basic " + base64.b64encode(credentials.encode()).decode()}
+
+    @staticmethod
+    def _dropped(conn: http.client.HTTPConnection) -> bool:
+        """An idle connection with something to read was closed (or broken) by the server."""
+        if conn.sock is None:
+            return True
+        try:
+            return bool(select.select([conn.sock], [], [], 0)[0])
+        except (OSError, ValueError):
+            return True
+
+    def _checkout(self, key: Tuple[str, str]) -> Optional[http.client.HTTPConnection]:
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                conn = idle.pop() if idle else None
+            if conn is None or not self._dropped(conn):
+                return conn
+            self._discard(conn)
+
+    def _connect(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        proxy = self._proxy((scheme, netloc))
+        if scheme == "https":
+            if proxy is None:
+                conn = http.client.HTTPSConnection(netloc, timeout=self.timeout, context=self.context)
+            else:
+                conn = http.client.HTTPSConnection(
+                    proxy.hostname, proxy.port or 80, timeout=self.timeout, context=self.context
+                )
+                conn.set_tunnel(netloc, headers=self._proxy_headers(proxy))
+        elif scheme == "http":
+            if proxy is None:
+                conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(proxy.hostname, proxy.port or 80, timeout=self.timeout)
+        else:
+            raise ValueError(f"Unsupported URL scheme: {scheme}")
+        with self._lock:
+            self.stats["connections"] += 1
+            self._open.add(conn)
+        return conn
+
+    def _discard(self, conn: http.client.HTTPConnection) -> None:
+        conn.close()
+        with self._lock:
+            self._open.discard(conn)
+
+    def _release(self, key: Tuple[str, str], conn: http.client.HTTPConnection,
+                 response: http.client.HTTPResponse) -> None:
+        """Back to the pool if the body was consumed and the server keeps the connection."""
+        if response.isclosed() and not response.will_close:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if conn in self._open and len(idle) < MAX_IDLE_PER_HOST:
+                    idle.append(conn)
+                    return
+        self._discard(conn)
+
+    def _send(self, key: Tuple[str, str], method: str, target: str, headers: Dict[str, str],
+              body: Optional[bytes]) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        conn = self._checkout(key)
+        if conn is not None:
+            try:
+                conn.request(method, target, body=body, headers=headers)
+                response = conn.getresponse()
+                with self._lock:
+                    self.stats["requests"] += 1
+                    self.stats["reused"] += 1
+                return conn, response
+            except STALE_ERRORS:
+                # Idle connection dropped by the server. Idempotent requests are
+                # retried on a fresh connection; anything else may have run already.
+                self._discard(conn)
+                if method not in IDEMPOTENT_METHODS:
+                    raise
+            except BaseException:
+                self._discard(conn)
+                raise
+
+        conn = self._connect(*key)
+        try:
+            conn.request(method, target, body=body, headers=headers)
+            response = conn.getresponse()
+        except BaseException:
+            self._discard(conn)
+            raise
+        with self._lock:
+            self.stats["requests"] += 1
+        return conn, response
+
+    @contextmanager
+    def stream(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+        redirects: int = MAX_REDIRECTS,
+    ) -> Iterator[http.client.HTTPResponse]:
+        """Open a response for incremental reading; redirects are followed."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        request_headers = {"User-Agent": self.user_agent, **(headers or {})}
+
+        send_target, send_headers = target, request_headers
+        proxy = self._proxy(key) if parts.scheme == "http" else None
+        if proxy is not None:
+            # Plain HTTP proxy: absolute URL, credentials on every request
+            send_target = f"http://{parts.netloc}{target}"
+            send_headers = {**request_headers, **self._proxy_headers(proxy)}
+
+        conn, response = self._send(key, method, send_target, send_headers, body)
+        location = response.getheader("Location")
+        if response.status in REDIRECT_CODES and location and redirects > 0:
+            response.read()
+            self._release(key, conn, response)
+            location = urljoin(url, location)
+            if urlsplit(location).netloc != parts.netloc:
+                # Credentials are for the API host only, never for a CDN
+                request_headers.pop("Authorization", None)
+            if response.status not in (307, 308):
+                method, body = ("GET" if method != "HEAD" else method), None
+                request_headers.pop("Content-Type", None)
+            with self.stream(method, location, request_headers, body, redirects - 1) as redirected:
+                yield redirected
+            return
+
+        try:
+            yield response
+        finally:
+            self._release(key, conn, response)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+    ) -> Response:
+        with self.stream(method, url, headers, body) as response:
+            data = response.read()
+            return Response(response.status, {k.lower(): v for k, v in response.getheaders()}, data)
+
+    def close(self) -> None:
+        """Close every connection, idle or in use."""
+        with self._lock:
+            connections, self._open, self._idle = self._open, set(), {}
+        for conn in connections:
+            conn.close()
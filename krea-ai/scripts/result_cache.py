@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Local cache of generation results for deterministic requests.
+Entries are addressed by the sha256 of the normalized request (endpoint +
+payload) and hold the downloaded images plus metadata. Only requests that
+reproduce the same image are cached (Flux with an explicit seed, no reference
+images). Size-bounded: least recently used entries are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SKILL_DIR = Path(__file__).parent.parent
+DEFAULT_CACHE_DIR = SKILL_DIR / ".cache" / "results"
+DEFAULT_MAX_BYTES = 1 << 30
+META_FILENAME = "meta.json"
+# Models whose output is fully determined by the payload once a seed is set
+DETERMINISTIC_MODELS = {"bfl/flux-1.1-pro-ultra"}
+
+
+def is_deterministic(model: str, payload: Dict[str, Any]) -> bool:
+    return (model in DETERMINISTIC_MODELS and payload.get("seed") is not None
+            and not payload.get("imageUrls"))
+
+
+def cache_key(endpoint: str, payload: Dict[str, Any]) -> str:
+    """sha256 of the canonical JSON request: key order and spacing do not matter."""
+    canonical = json.dumps({"endpoint": endpoint, "payload": payload},
+                           sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """<root>/<key[:2]>/<key>/{meta.json, 00.png, ...}; meta.json mtime is the LRU clock."""
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Entry metadata with absolute image paths, or None; marks the entry as recently used."""
+        entry_dir = self.entry_dir(key)
+        meta_path = entry_dir / META_FILENAME
+        try:
+            meta = json.loads(meta_path.read_text())
+            images = [entry_dir / name for name in meta["images"]]
+            if not all(path.is_file() for path in images):
+                return None
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return dict(meta, images=[str(path) for path in images])
+
+    def put(self, key: str, meta: Dict[str, Any], images: List[Path]) -> None:
+        """Copy images into a new entry (atomically replacing an old one), then evict."""
+        entry_dir = self.entry_dir(key)
+        tmp_dir = entry_dir.with_name(f".{key}.{uuid.uuid4().hex}.tmp")
+        tmp_dir.mkdir(parents=True)
+        try:
+            names = []
+            for idx, image in enumerate(images):
+                name = f"{idx:02d}{Path(image).suffix}"
+                shutil.copyfile(image, tmp_dir / name)
+                names.append(name)
+            size = sum((tmp_dir / name).stat().st_size for name in names)
+            meta = dict(meta, key=key, images=names, size=size, created_at=time.time())
+            (tmp_dir / META_FILENAME).write_text(json.dumps(meta, ensure_ascii=False, indent=2))
+            with self._lock:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                try:
+                    os.replace(tmp_dir, entry_dir)
+                except OSError:
+                    pass  # another process stored the same result meanwhile
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """[{'dir', 'size', 'used'}] for every complete entry."""
+        found = []
+        for meta_path in self.root.glob(f"*/*/{META_FILENAME}"):
+            if meta_path.parent.name.startswith("."):
+                continue  # entry still being written
+            try:
+                size = json.loads(meta_path.read_text())["size"]
+                used = meta_path.stat().st_mtime
+            except (OSError, ValueError, KeyError):
+                continue
+            found.append({"dir": meta_path.parent, "size": size, "used": used})
+        return found
+
+    def evict(self) -> List[Path]:
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        removed = []
+        with self._lock:
+            entries = sorted(self.entries(), key=lambda entry: entry["used"])
+            total = sum(entry["size"] for entry in entries)
+            for entry in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry["dir"], ignore_errors=True)
+                try:
+                    entry["dir"].parent.rmdir()
+                except OSError:
+                    pass  # other entries share the prefix dir
+                total -= entry["size"]
+                removed.append(entry["dir"])
+        return removed
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for time tracking reports on synthetic data
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import store
+import export
+import weekly
+
+WORDS = [
+    'встреча', 'созвон', 'разработка', 'дорога', 'обед', 'почта', 'отчёт', 'смета',
+    'клиент', 'бот', 'документация', 'ревью', 'спорт', 'семья', 'чтение', 'план',
+    'meeting', 'coding', 'review', 'email', 'call', 'design', 'research', 'lunch',
+]
+
+
+def make_categories_file(path, keywords, categories=20, seed=5):
+    """categories.md with the given total number of keywords"""
+    rng = random.Random(seed)
+    lines = ["# Категории"]
+    per_category = max(keywords // categories, 1)
+    for c in range(categories):
+        lines += ["", f"## 📁 Категория {c}", "", f"### Подкатегория {c}"]
+        for _ in range(per_category):
+            lines.append(f"- {rng.choice(WORDS)} {rng.choice(WORDS)} {rng.randrange(100)}")
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def make_activities(categories, days, slots_per_day=28, distinct=600, seed=9):
+    """A year-like stream of activities: a pool of repeated texts, some with keywords"""
+    rng = random.Random(seed)
+    keywords = [k for values in categories.values() for k in values]
+    pool = []
+    for _ in range(distinct):
+        words = [rng.choice(WORDS) for _ in range(rng.randrange(2, 6))]
+        if keywords and rng.random() < 0.6:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        pool.append(' '.join(words).capitalize())
+    return [rng.choice(pool) for _ in range(days * slots_per_day)]
+
+
+def make_synthetic_diary(root, days, seed=13):
+    """Daily notes with a full Time Tracking table (08:00-22:00, 30 min rows)"""
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    first = weekly.date(2020, 1, 1)
+    pool = [' '.join(rng.choice(WORDS) for _ in range(rng.randrange(1, 4))).capitalize()
+            for _ in range(300)]
+    for offset in range(days):
+        day = first + weekly.timedelta(days=offset)
+        lines = [f"# {day}", "", "## 🎯 Задачи", "", "- [ ] Задача", "",
+                 "## Time Tracking", "", "| Время | Активность |", "|-------|-----------|"]
+        for slot in range(28):
+            start = 8 * 60 + slot * 30
+            lines.append(f"| {store.format_minutes(start)}-{store.format_minutes(start + 30)} "
+                         f"| {rng.choice(pool)} |")
+        lines += ["", "## 💡 Заметки", ""]
+        (root / f"{day}.md").write_text('\n'.join(lines), encoding='utf-8')
+    return first, first + weekly.timedelta(days=days - 1)
+
+
+def timed(func, *args, **kwargs):
+    """Run func once and return (result, seconds)"""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def bench_categorize(args):
+    """Nested-loop categorize_activity vs the Aho-Corasick matcher"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'categories.md'
+        make_categories_file(path, args.keywords)
+        categories = weekly.load_categories(path)
+
+    activities = make_activities(categories, args.days)
+    keywords = sum(len(values) for values in categories.values())
+    print(f"Categories: {len(categories)}, keywords: {keywords}, "
+          f"entries: {len(activities)} ({len(set(activities))} distinct)")
+
+    legacy, legacy_time = timed(lambda: [weekly.categorize_activity(a, categories) for a in activities])
+    matcher, build_time = timed(weekly.CategoryMatcher, categories)
+    labels = matcher.labels
+    _, scan_time = timed(lambda: [labels[matcher.match(a)][0] for a in activities])
+    memo, memo_time = timed(lambda: [matcher(a) for a in activities])
+
+    print(f"  nested loops:          {legacy_time * 1000:8.1f}ms")
+    print(f"  automaton build:       {build_time * 1000:8.1f}ms")
+    print(f"  automaton, no memo:    {scan_time * 1000:8.1f}ms (x{legacy_time / scan_time:.1f})")
+    print(f"  automaton + memo:      {memo_time * 1000:8.1f}ms (x{legacy_time / memo_time:.1f})")
+    print(f"  mismatches:            {sum(a != b for a, b in zip(legacy, memo))}")
+
+
+def bench_categories(args):
+    """Cold categories.md parse + automaton build vs the cached model"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'categories.md'
+        cache_path = Path(tmp) / 'categories.json'
+        make_categories_file(path, args.keywords)
+
+        cold, cold_time = timed(weekly.load_category_matcher, path, cache_path)
+        warm, warm_time = timed(weekly.load_category_matcher, path, cache_path)
+        path.touch()  # same content, new mtime: hash check, no parse
+        _, touched_time = timed(weekly.load_category_matcher, path, cache_path)
+
+        activities = make_activities(weekly.load_categories(path), 30)
+        same = all(cold.classify(a) == warm.classify(a) for a in activities)
+        print(f"Keywords: {args.keywords}")
+        print(f"  parse + build:       {cold_time * 1000:8.1f}ms")
+        print(f"  cached (mtime hit):  {warm_time * 1000:8.1f}ms")
+        print(f"  cached (hash hit):   {touched_time * 1000:8.1f}ms")
+        print(f"  identical results:   {same}")
+
+
+def bench_export(args):
+    """Rows/s of CSV and columnar export from the store, with a round-trip check"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        first, last = make_synthetic_diary(tmp / 'diary', args.years * 365)
+        categories = weekly.CategoryMatcher(weekly.parse_categories(weekly.CATEGORIES_PATH.read_text()))
+
+        tracking_store = store.TrackingStore(tmp / 'tracking.sqlite')
+        _, ingest_time = timed(tracking_store.ingest, tmp / 'diary')
+        print(f"Diary: {args.years} years, {tracking_store.count()} rows, "
+              f"ingest {ingest_time:.2f}s")
+
+        outputs = {}
+        for fmt, exporter in (('csv', export.export_csv), ('columnar', export.export_columnar)):
+            output = tmp / f"export.{fmt}"
+            rows, seconds = timed(exporter, tracking_store.entries(first, last), categories, output)
+            outputs[fmt] = output
+            print(f"  {fmt:9} {rows / seconds:10,.0f} rows/s  {os.path.getsize(output) / 1024:8.0f} KB")
+
+        expected = ((e['date'], e['start_min'], e['end_min'], e['activity'])
+                    for e in tracking_store.entries(first, last))
+        actual = ((e['date'], e['start_min'], e['end_min'], e['activity'])
+                  for e in export.read_columnar(outputs['columnar']))
+        print(f"  columnar round trip identical: {all(a == b for a, b in zip(expected, actual))}")
+        tracking_store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time tracking benchmarks')
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    categorize = sub.add_parser('categorize', help='Activity categorization throughput')
+    categorize.add_argument('--keywords', type=int, default=500)
+    categorize.add_argument('--days', type=int, default=365)
+    categorize.set_defaults(func=bench_categorize)
+
+    categories = sub.add_parser('categories', help='Category model load, cold vs cached')
+    categories.add_argument('--keywords', type=int, default=500)
+    categories.set_defaults(func=bench_categories)
+
+    exporting = sub.add_parser('export', help='Bulk export throughput on a multi-year diary')
+    exporting.add_argument('--years', type=int, default=3)
+    exporting.set_defaults(func=bench_export)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Shared diary reader (1. Дневник/YYYY-MM-DD.md)
+Reads a file once and splits it in a single pass into the sections the skills
+use: Time Tracking table, checkbox tasks, ЗОЖ meals and water.
+The same module ships in business-assistant/scripts and time-tracker/scripts;
+keep both copies identical.
+"""
+
+import re
+import sys
+from pathlib import Path
+from datetime import date, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+TRACKING_HEADER = '## Time Tracking'
+MEALS_HEADER = '## ЗОЖ - Питание'
+WATER_HEADER = '## ЗОЖ - Вода'
+
+# | 08:00-08:30 | Activity |
+TRACKING_ROW_RE = re.compile(r'\|\s*(\d{2}:\d{2})-(\d{2}:\d{2})\s*\|\s*(.+?)\s*\|')
+# - [ ] task / - [x] done
+CHECKBOX_RE = re.compile(r'^\s*-\s+\[(\s|x|X)\]\s+')
+# | 08:00 | cell | cell ... |
+TIMED_ROW_RE = re.compile(r'^\|\s*(\d{1,2}:\d{2})\s*\|(.*)\|\s*$')
+NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)?')
+DIARY_FILE_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})\.md$')
+
+DEFAULT_WORKERS = 4
+MEAL_FIELDS = ('products', 'protein_g', 'carbs_g', 'fat_g', 'kcal', 'mark')
+
+
+class DiaryDay:
+    """Parsed sections of one diary file"""
+    
+    __slots__ = ('path', 'tracking', 'tasks', 'meals', 'water')
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tracking = []  # (start, end, activity)
+        self.tasks = []     # (line_number, completed, text)
+        self.meals = []     # {'time', 'products', 'protein_g', ..., 'mark'}
+        self.water = []     # (time, ml)
+    
+    @property
+    def date(self):
+        match = DIARY_FILE_RE.match(self.path.name)
+        return date.fromisoformat(match.group(1)) if match else None
+    
+    @property
+    def completed_tasks(self):
+        return [text for _, completed, text in self.tasks if completed]
+    
+    @property
+    def open_tasks(self):
+        return [text for _, completed, text in self.tasks if not completed]
+
+
+def parse_number(cell):
+    """First number in a table cell ('24г', '1,5 л'), None if there is none"""
+    match = NUMBER_RE.search(cell)
+    if not match:
+        return None
+    value = float(match.group().replace(',', '.'))
+    return int(value) if value.is_integer() else value
+
+
+def parse_lines(lines, path=''):
+    """Split diary lines into sections in one pass"""
+    day = DiaryDay(path)
+    section = None
+    tracking_done = False
+    
+    for line_number, line in enumerate(lines, 1):
+        # Checkboxes first: a task may mention a header ("Заполнить ## Time Tracking")
+        match = CHECKBOX_RE.match(line)
+        if match:
+            day.tasks.append((line_number, match.group(1) in 'xX', line[match.end():].strip()))
+            continue
+        
+        if line.startswith('#'):
+            if TRACKING_HEADER in line and not tracking_done:
+                section = 'tracking'
+                continue
+            if line.startswith('##'):
+                # Next section; the tracking table is only read once
+                tracking_done = tracking_done or section == 'tracking'
+                if line.startswith(MEALS_HEADER):
+                    section = 'meals'
+                elif line.startswith(WATER_HEADER):
+                    section = 'water'
+                else:
+                    section = None
+                continue
+        
+        if section == 'tracking':
+            match = TRACKING_ROW_RE.match(line)
+            if match:
+                start, end, activity = match.groups()
+                day.tracking.append((start, end, activity.strip()))
+        elif section == 'meals':
+            match = TIMED_ROW_RE.match(line)
+            if match:
+                cells = [cell.strip() for cell in match.group(2).split('|')]
+                cells += [''] * (len(MEAL_FIELDS) - len(cells))
+                meal = {'time': match.group(1), 'products': cells[0], 'mark': cells[5]}
+                for field, cell in zip(MEAL_FIELDS[1:5], cells[1:5]):
+                    meal[field] = parse_number(cell)
+                day.meals.append(meal)
+        elif section == 'water':
+            match = TIMED_ROW_RE.match(line)
+            if match:
+                ml = parse_number(match.group(2))
+                if ml is not None:
+                    day.water.append((match.group(1), ml))
+    
+    return day
+
+
+def read_diary(path):
+    """Parse one file; None if it is missing or unreadable"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return parse_lines(f, path)
+    except FileNotFoundError:
+        return None
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Warning: cannot read {path}: {e}", file=sys.stderr)
+        return None
+
+
+def read_diaries(paths, workers=DEFAULT_WORKERS):
+    """
+    Yield read_diary() results in input order. With workers > 1 files are read
+    on a thread pool (network-mounted vaults are I/O bound); at most
+    workers * 4 parsed files wait for the consumer at any time.
+    """
+    if workers <= 1:
+        for path in paths:
+            yield read_diary(path)
+        return
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append(pool.submit(read_diary, path))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def diary_file(diary_path, day):
+    return Path(diary_path) / f"{day.strftime('%Y-%m-%d')}.md"
+
+
+def diary_files(diary_path, start, end):
+    """Paths for every date from start to end inclusive (existing or not)"""
+    return [diary_file(diary_path, start + timedelta(days=offset))
+            for offset in range((end - start).days + 1)]
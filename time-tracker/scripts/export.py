@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Time Tracking Export
+Streams entries to CSV or to a compact binary columnar file, chunk by chunk
+"""
+
+import io
+import sys
+import csv
+import json
+import time
+import array
+import struct
+import argparse
+from pathlib import Path
+from datetime import date, timedelta
+
+import diary
+import store
+import weekly
+
+CHUNK_ROWS = 10000
+CSV_FIELDS = ['date', 'start', 'end', 'duration_min', 'activity', 'category', 'subcategory']
+
+# Columnar layout (little-endian):
+#   MAGIC, then chunks of [uint32 rows][column arrays in COLUMNS order],
+#   then a UTF-8 JSON footer (dictionaries, chunk offsets), uint64 footer offset, MAGIC.
+# Strings are dictionary-encoded: activity/category/subcategory columns hold ids.
+MAGIC = b'TTC1'
+COLUMNS = (
+    ('day', 'i'),          # date.toordinal()
+    ('start_min', 'h'),
+    ('end_min', 'h'),      # may exceed 1440 for rows past midnight
+    ('activity_id', 'I'),
+    ('category_id', 'H'),
+    ('subcategory_id', 'H'),  # 0 = no subcategory
+)
+
+
+def chunked(entries, size=CHUNK_ROWS):
+    """Lists of at most `size` entries"""
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_csv(entries, categories, output, chunk_rows=CHUNK_ROWS):
+    """Write entries as CSV, one buffered write per chunk; returns row count"""
+    rows = 0
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        f.write(','.join(CSV_FIELDS) + '\r\n')
+        for chunk in chunked(entries, chunk_rows):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for entry in chunk:
+                category, subcategory = categories.classify(entry['activity'])
+                writer.writerow((entry['date'], entry['start'], entry['end'], entry['duration_min'],
+                                 entry['activity'], category, subcategory or ''))
+            f.write(buffer.getvalue())
+            rows += len(chunk)
+    return rows
+
+
+class _Dictionary:
+    """String -> id in order of first appearance"""
+    
+    def __init__(self, reserved=()):
+        self.values = list(reserved)
+        self.ids = {value: i for i, value in enumerate(self.values)}
+    
+    def __getitem__(self, value):
+        key = self.ids.get(value)
+        if key is None:
+            key = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return key
+
+
+def export_columnar(entries, categories, output, chunk_rows=CHUNK_ROWS):
+    """Write entries in the columnar format; returns row count"""
+    activities = _Dictionary()
+    category_names = _Dictionary()
+    subcategories = _Dictionary([''])
+    chunks = []
+    rows = 0
+    last_date = last_day = None
+    
+    with open(output, 'wb') as f:
+        f.write(MAGIC)
+        for chunk in chunked(entries, chunk_rows):
+            columns = {name: array.array(code) for name, code in COLUMNS}
+            for entry in chunk:
+                category, subcategory = categories.classify(entry['activity'])
+                if entry['date'] != last_date:
+                    last_date, last_day = entry['date'], date.fromisoformat(entry['date']).toordinal()
+                columns['day'].append(last_day)
+                columns['start_min'].append(entry['start_min'])
+                columns['end_min'].append(entry['end_min'])
+                columns['activity_id'].append(activities[entry['activity']])
+                columns['category_id'].append(category_names[category])
+                columns['subcategory_id'].append(subcategories[subcategory or ''])
+            
+            chunks.append({'offset': f.tell(), 'rows': len(chunk)})
+            f.write(struct.pack('<I', len(chunk)))
+            for name, _ in COLUMNS:
+                column = columns[name]
+                if sys.byteorder != 'little':
+                    column.byteswap()
+                f.write(column.tobytes())
+            rows += len(chunk)
+        
+        footer_offset = f.tell()
+        footer = {
+            'columns': COLUMNS,
+            'rows': rows,
+            'chunks': chunks,
+            'activities': activities.values,
+            'categories': category_names.values,
+            'subcategories': subcategories.values,
+        }
+        f.write(json.dumps(footer, ensure_ascii=False).encode('utf-8'))
+        f.write(struct.pack('<Q', footer_offset))
+        f.write(MAGIC)
+    return rows
+
+
+def read_columnar(path):
+    """Yield entries back from a columnar export (chunk by chunk)"""
+    with open(path, 'rb') as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"{path}: not a time tracking columnar file")
+        footer_end = f.seek(-12, 2)
+        footer_offset = struct.unpack('<Q', f.read(8))[0]
+        f.seek(footer_offset)
+        footer = json.loads(f.read(footer_end - footer_offset).decode('utf-8'))
+        
+        for chunk in footer['chunks']:
+            f.seek(chunk['offset'])
+            count = struct.unpack('<I', f.read(4))[0]
+            columns = {}
+            for name, code in footer['columns']:
+                column = array.array(code)
+                column.frombytes(f.read(count * column.itemsize))
+                if sys.byteorder != 'little':
+                    column.byteswap()
+                columns[name] = column
+            
+            for i in range(count):
+                start_min, end_min = columns['start_min'][i], columns['end_min'][i]
+                yield {
+                    'date': date.fromordinal(columns['day'][i]).isoformat(),
+                    'start': store.format_minutes(start_min % store.DAY_MINUTES),
+                    'end': store.format_minutes(end_min % store.DAY_MINUTES),
+                    'activity': footer['activities'][columns['activity_id'][i]],
+                    'category': footer['categories'][columns['category_id'][i]],
+                    'subcategory': footer['subcategories'][columns['subcategory_id'][i]] or None,
+                    'start_min': start_min,
+                    'end_min': end_min,
+                    'duration_min': end_min - start_min,
+                }
+
+
+def parse_iso_week(value):
+    """'2026-W08' -> (monday, sunday)"""
+    year, week = value.upper().split('-W')
+    monday = date.fromisocalendar(int(year), int(week), 1)
+    return monday, monday + timedelta(days=6)
+
+
+def diary_date_range():
+    """First and last dated diary file, or None for an empty diary"""
+    days = []
+    for path in weekly.DIARY_PATH.glob('*.md'):
+        match = diary.DIARY_FILE_RE.match(path.name)
+        if match:
+            days.append(match.group(1))
+    if not days:
+        return None
+    return date.fromisoformat(min(days)), date.fromisoformat(max(days))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export time tracking entries')
+    period = parser.add_mutually_exclusive_group()
+    period.add_argument('--week', help='ISO week, YYYY-Www')
+    period.add_argument('--month', help='Calendar month, YYYY-MM')
+    period.add_argument('--year', type=int, help='Calendar year')
+    period.add_argument('--from', dest='date_from', help='Range start, YYYY-MM-DD')
+    parser.add_argument('--to', dest='date_to', help='Range end, YYYY-MM-DD (default today)')
+    parser.add_argument('--output', type=Path, required=True, help='Output file')
+    parser.add_argument('--format', choices=['csv', 'columnar'],
+                        help='Output format (default from extension: .csv, otherwise columnar)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--no-store', action='store_true',
+                        help='Read diary files directly instead of the tracking store')
+    args = parser.parse_args()
+    
+    try:
+        if args.week:
+            start, end = parse_iso_week(args.week)
+        elif args.month or args.year or args.date_from or args.date_to:
+            args.weeks = 1
+            start, end, _, _ = weekly.get_period(args)
+        else:
+            # Everything in the diary
+            span = diary_date_range()
+            if span is None:
+                print("Нет данных для экспорта.", file=sys.stderr)
+                sys.exit(1)
+            start, end = span
+    except ValueError as e:
+        parser.error(str(e))
+    
+    fmt = args.format or ('csv' if args.output.suffix.lower() == '.csv' else 'columnar')
+    exporter = export_csv if fmt == 'csv' else export_columnar
+    
+    categories = weekly.load_category_matcher()
+    entries = weekly.load_entries(start, end, use_store=not args.no_store)
+    started = time.perf_counter()
+    rows = exporter(entries, categories, args.output, args.chunk_rows)
+    elapsed = time.perf_counter() - started
+    
+    print(f"✅ {rows} rows ({start} - {end}) → {args.output} [{fmt}] "
+          f"in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Time Tracking Store
+Compact SQLite copy of all `## Time Tracking` tables, updated incrementally
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import date, datetime, timedelta
+
+import diary
+
+SKILL_DIR = Path(__file__).parent.parent
+CONFIG_PATH = SKILL_DIR / "config.json"
+STORE_FILENAME = "tracking.sqlite"
+DAY_MINUTES = 24 * 60
+
+
+def load_config(config_path=None):
+    """Load skill config (defaults to config.json next to scripts/)"""
+    with open(config_path or CONFIG_PATH) as f:
+        return json.load(f)
+
+
+def get_diary_path(config):
+    return Path.home() / ".openclaw" / "workspace" / config["storage"]["diary_path"]
+
+
+def get_cache_dir(config):
+    """Skill cache dir (config cache.dir, relative to the skill)"""
+    cache_dir = Path(config.get('cache', {}).get('dir', '.cache'))
+    if not cache_dir.is_absolute():
+        cache_dir = SKILL_DIR / cache_dir
+    return cache_dir
+
+
+def get_store_path(config):
+    return get_cache_dir(config) / STORE_FILENAME
+
+
+def to_minutes(hhmm):
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def make_entry(date_str, start_min, end_min, activity, interval_minutes=30):
+    """
+    Entry with the real duration. A row ending before it starts runs past
+    midnight; a zero-length row counts as one tracking interval.
+    """
+    if end_min < start_min:
+        end_min += DAY_MINUTES
+    duration = end_min - start_min or interval_minutes
+    return {
+        'date': date_str,
+        'start': format_minutes(start_min),
+        'end': format_minutes((start_min + duration) % DAY_MINUTES),
+        'activity': activity,
+        'start_min': start_min,
+        'end_min': start_min + duration,
+        'duration_min': duration
+    }
+
+
+class TrackingStore:
+    """
+    Entries as integer columns: day ordinal, start/end minutes, activity id.
+    Activity texts are stored once in a dictionary table; categories are
+    resolved at report time so editing categories.md needs no re-ingest.
+    Diary files are re-parsed only when their mtime/size changes.
+    """
+    
+    def __init__(self, path, rebuild=False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        if rebuild:
+            for table in ('entries', 'activities', 'files'):
+                self.conn.execute(f'DROP TABLE IF EXISTS {table}')
+        self.conn.executescript(
+            'CREATE TABLE IF NOT EXISTS files ('
+            '  day INTEGER PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS activities ('
+            '  id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE);'
+            'CREATE TABLE IF NOT EXISTS entries ('
+            '  day INTEGER NOT NULL, start INTEGER NOT NULL, end INTEGER NOT NULL,'
+            '  activity_id INTEGER NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS entries_day ON entries (day, start);'
+        )
+        self.activity_ids = {
+            text: activity_id
+            for activity_id, text in self.conn.execute('SELECT id, text FROM activities')
+        }
+        self.stats = {'rebuilt': rebuild, 'files_total': 0, 'files_cached': 0,
+                      'files_parsed': 0, 'files_removed': 0}
+    
+    def activity_id(self, text):
+        activity_id = self.activity_ids.get(text)
+        if activity_id is None:
+            cursor = self.conn.execute('INSERT INTO activities (text) VALUES (?)', (text,))
+            activity_id = self.activity_ids[text] = cursor.lastrowid
+        return activity_id
+    
+    def ingest(self, diary_path, workers=diary.DEFAULT_WORKERS):
+        """Sync the store with the diary directory; returns stats"""
+        known = {
+            day: (mtime_ns, size)
+            for day, mtime_ns, size in self.conn.execute('SELECT day, mtime_ns, size FROM files')
+        }
+        seen = set()
+        
+        try:
+            dir_entries = list(os.scandir(diary_path))
+        except OSError:
+            dir_entries = []
+        
+        changed = []  # (day, path, stat) of new or modified files
+        for dir_entry in dir_entries:
+            match = diary.DIARY_FILE_RE.match(dir_entry.name)
+            if not match:
+                continue
+            try:
+                day = date.fromisoformat(match.group(1)).toordinal()
+                st = dir_entry.stat()
+            except (ValueError, OSError):
+                continue
+            seen.add(day)
+            self.stats['files_total'] += 1
+            if known.get(day) == (st.st_mtime_ns, st.st_size):
+                self.stats['files_cached'] += 1
+                continue
+            changed.append((day, dir_entry.path, st))
+        
+        # Changed files are read on a thread pool, rows written as they arrive
+        parsed = diary.read_diaries([path for _, path, _ in changed], workers)
+        for (day, _, st), diary_day in zip(changed, parsed):
+            tracking = diary_day.tracking if diary_day else []
+            rows = [
+                (day, to_minutes(start), to_minutes(end), self.activity_id(activity))
+                for start, end, activity in tracking
+            ]
+            self.conn.execute('DELETE FROM entries WHERE day = ?', (day,))
+            self.conn.executemany('INSERT INTO entries VALUES (?, ?, ?, ?)', rows)
+            self.conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?)',
+                              (day, st.st_mtime_ns, st.st_size))
+            self.stats['files_parsed'] += 1
+        
+        for day in known.keys() - seen:
+            self.conn.execute('DELETE FROM entries WHERE day = ?', (day,))
+            self.conn.execute('DELETE FROM files WHERE day = ?', (day,))
+            self.stats['files_removed'] += 1
+        
+        self.conn.commit()
+        return self.stats
+    
+    def entries(self, start_date, end_date, interval_minutes=30):
+        """Yield entries for start_date..end_date inclusive, ordered by day and time"""
+        rows = self.conn.execute(
+            'SELECT e.day, e.start, e.end, a.text FROM entries e '
+            'JOIN activities a ON a.id = e.activity_id '
+            'WHERE e.day BETWEEN ? AND ? ORDER BY e.day, e.start',
+            (start_date.toordinal(), end_date.toordinal())
+        )
+        date_str = day_ordinal = None
+        for day, start, end, activity in rows:
+            if day != day_ordinal:
+                date_str, day_ordinal = date.fromordinal(day).isoformat(), day
+            yield make_entry(date_str, start, end, activity, interval_minutes)
+    
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+    
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def get_io_threads(config):
+    return config["storage"].get("io_threads", diary.DEFAULT_WORKERS)
+
+
+def open_store(config, rebuild=False, diary_path=None):
+    """Open the store and bring it up to date with the diary"""
+    store = TrackingStore(get_store_path(config), rebuild=rebuild)
+    store.ingest(diary_path or get_diary_path(config), get_io_threads(config))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest Time Tracking tables into the store')
+    parser.add_argument('--config', type=Path, help='Path to config.json')
+    parser.add_argument('--diary', type=Path, help='Diary directory (default from config)')
+    parser.add_argument('--rebuild', action='store_true', help='Drop and re-ingest everything')
+    args = parser.parse_args()
+    
+    config = load_config(args.config)
+    started = datetime.now()
+    store = open_store(config, rebuild=args.rebuild, diary_path=args.diary)
+    elapsed = (datetime.now() - started) / timedelta(milliseconds=1)
+    
+    print(json.dumps(dict(store.stats, entries=store.count(), ms=round(elapsed, 1),
+                          path=str(store.path)), ensure_ascii=False, indent=2))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
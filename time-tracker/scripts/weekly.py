@@ -4,21 +4,30 @@ Weekly Time Tracking Report
 Generates statistics and grouped activity report
 """
 
+import os
 import re
 import json
+import hashlib
+import argparse
 from pathlib import Path
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import date, datetime, timedelta
+from collections import Counter, defaultdict
+
+import diary
+import store
 
 # Paths
 SKILL_DIR = Path(__file__).parent.parent
 CONFIG_PATH = SKILL_DIR / "config.json"
 CATEGORIES_PATH = SKILL_DIR / "references" / "categories.md"
+CATEGORIES_CACHE_FILENAME = "categories.json"
 
 with open(CONFIG_PATH) as f:
     config = json.load(f)
 
 DIARY_PATH = Path.home() / ".openclaw" / "workspace" / config["storage"]["diary_path"]
+INTERVAL_MINUTES = config["tracking"].get("interval_minutes", 30)
+TRACKING_WINDOW = (config["tracking"]["start_hour"] * 60, config["tracking"]["end_hour"] * 60)
 
 
 def get_week_dates():
@@ -29,48 +38,78 @@ def get_week_dates():
     return [monday + timedelta(days=i) for i in range(7)]
 
 
-def parse_diary(date):
-    """Parse time tracking entries from diary file"""
-    diary_file = DIARY_PATH / f"{date.strftime('%Y-%m-%d')}.md"
+def get_period(args, today=None):
+    """Resolve CLI options to (start, end, title, file slug); current week by default"""
+    today = today or date.today()
     
-    if not diary_file.exists():
-        return []
+    if args.month:
+        start = datetime.strptime(args.month, '%Y-%m').date()
+        next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return start, next_month - timedelta(days=1), f"Сводка за {args.month}", args.month
     
-    content = diary_file.read_text()
-    entries = []
+    if args.year:
+        start, end = date(args.year, 1, 1), date(args.year, 12, 31)
+        return start, end, f"Сводка за {args.year} год", str(args.year)
     
-    # Find Time Tracking table
-    in_tracking = False
-    for line in content.split('\n'):
-        if '## Time Tracking' in line:
-            in_tracking = True
-            continue
-        
-        if in_tracking:
-            # Match table rows: | 08:00-08:30 | Activity |
-            match = re.match(r'\|\s*(\d{2}:\d{2})-(\d{2}:\d{2})\s*\|\s*(.+?)\s*\|', line)
-            if match:
-                start, end, activity = match.groups()
-                entries.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'start': start,
-                    'end': end,
-                    'activity': activity.strip(),
-                    'duration_min': 30  # Fixed interval
-                })
-            elif line.startswith('##'):
-                # Next section, stop parsing
-                break
+    if args.date_from or args.date_to:
+        end = date.fromisoformat(args.date_to) if args.date_to else today
+        start = date.fromisoformat(args.date_from) if args.date_from else end - timedelta(days=6)
+        if start > end:
+            raise ValueError(f"--from {start} is after --to {end}")
+        return start, end, f"Сводка {start} — {end}", f"{start}_{end}"
     
+    monday = today - timedelta(days=today.weekday())
+    weeks = max(args.weeks, 1)
+    start = monday - timedelta(weeks=weeks - 1)
+    end = monday + timedelta(days=6)
+    if weeks > 1:
+        return start, end, f"Сравнение последних {weeks} недель", f"{monday.strftime('%Y-W%W')}-x{weeks}"
+    return start, end, "Недельная сводка Time Tracking", monday.strftime('%Y-W%W')
+
+
+def iter_dates(start, end):
+    """Dates from start to end inclusive"""
+    for offset in range((end - start).days + 1):
+        yield start + timedelta(days=offset)
+
+
+def diary_entries(diary_day, date_str):
+    """Tracking rows of a parsed diary file as entries sorted by start time"""
+    if diary_day is None:
+        return []
+    entries = [
+        store.make_entry(date_str, store.to_minutes(start), store.to_minutes(end),
+                         activity, INTERVAL_MINUTES)
+        for start, end, activity in diary_day.tracking
+    ]
+    entries.sort(key=lambda entry: entry['start_min'])
     return entries
 
 
-def load_categories():
-    """Load category keywords from categories.md"""
-    if not CATEGORIES_PATH.exists():
-        return {}
+def parse_diary(date):
+    """Parse time tracking entries from diary file"""
+    diary_day = diary.read_diary(diary.diary_file(DIARY_PATH, date))
+    return diary_entries(diary_day, date.strftime('%Y-%m-%d'))
+
+
+def load_entries(start, end, use_store=True, rebuild_store=False):
+    """Stream entries for start..end inclusive, ordered by day and start time"""
+    if not use_store:
+        paths = diary.diary_files(DIARY_PATH, start, end)
+        for day, diary_day in zip(iter_dates(start, end),
+                                  diary.read_diaries(paths, store.get_io_threads(config))):
+            yield from diary_entries(diary_day, day.isoformat())
+        return
     
-    content = CATEGORIES_PATH.read_text()
+    tracking_store = store.open_store(config, rebuild=rebuild_store, diary_path=DIARY_PATH)
+    try:
+        yield from tracking_store.entries(start, end, INTERVAL_MINUTES)
+    finally:
+        tracking_store.close()
+
+
+def parse_categories(content):
+    """Category -> [(keyword, subcategory)] in file order (subcategory None above any ###)"""
     categories = {}
     current_category = None
     current_subcategory = None
@@ -79,6 +118,7 @@ def load_categories():
         # Main category: ## 🏢 Работа
         if line.startswith('## '):
             current_category = re.sub(r'^##\s*[^\w\s]*\s*', '', line).strip()
+            current_subcategory = None
             categories[current_category] = []
         
         # Subcategory: ### Программирование
@@ -88,11 +128,22 @@ def load_categories():
         # Keywords: - Программирование
         elif line.startswith('- ') and current_category:
             keyword = line[2:].strip().lower()
-            categories[current_category].append(keyword)
+            categories[current_category].append((keyword, current_subcategory))
     
     return categories
 
 
+def load_categories(path=CATEGORIES_PATH):
+    """Load category keywords from categories.md"""
+    if not path.exists():
+        return {}
+    
+    return {
+        category: [keyword for keyword, _ in keywords]
+        for category, keywords in parse_categories(path.read_text()).items()
+    }
+
+
 def categorize_activity(activity, categories):
     """Assign category to activity based on keywords"""
     activity_lower = activity.lower()
@@ -105,28 +156,258 @@ def categorize_activity(activity, categories):
     return "Прочее"
 
 
-def generate_report(entries, categories):
-    """Generate grouped statistics"""
-    if not entries:
-        return "Нет данных за эту неделю."
+class CategoryMatcher:
+    """
+    Aho-Corasick automaton over all category keywords.
+    Each node keeps the lowest file-order rank of a keyword ending there.
+    Categories are contiguous in the file, so the lowest rank found in one
+    scan belongs to the same category categorize_activity would pick (first
+    category wins), and to its first matching keyword's subcategory.
+    Results are memoized per activity.
+    """
+    
+    def __init__(self, categories):
+        """`categories` as from load_categories or parse_categories"""
+        self.names = list(categories)
+        self.labels = []  # rank -> (category, subcategory)
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword, subcategory = keyword if isinstance(keyword, tuple) else (keyword, None)
+                self.labels.append((category, subcategory, keyword))
+        
+        none = len(self.labels)
+        self.goto = [{}]
+        self.out = [none]
+        
+        # Trie of keywords
+        for rank, (_, _, keyword) in enumerate(self.labels):
+            node = 0
+            for ch in keyword:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = self.goto[node][ch] = len(self.goto)
+                    self.goto.append({})
+                    self.out.append(none)
+                node = nxt
+            self.out[node] = min(self.out[node], rank)
+        
+        # Failure links (BFS); a node also reports what its suffixes report
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for ch, child in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                self.out[child] = min(self.out[child], self.out[self.fail[child]])
+                queue.append(child)
+        
+        self.labels = [(category, subcategory) for category, subcategory, _ in self.labels]
+        self.labels.append(("Прочее", None))
+        self.cache = {}
+    
+    def to_state(self):
+        """JSON-serializable automaton (memo cache excluded)"""
+        return {'names': self.names, 'labels': self.labels,
+                'goto': self.goto, 'fail': self.fail, 'out': self.out}
+    
+    @classmethod
+    def from_state(cls, state):
+        matcher = cls.__new__(cls)
+        matcher.names = state['names']
+        matcher.labels = [tuple(label) for label in state['labels']]
+        matcher.goto = state['goto']
+        matcher.fail = state['fail']
+        matcher.out = state['out']
+        matcher.cache = {}
+        return matcher
+    
+    def match(self, activity):
+        """Rank of the winning keyword (len(keywords) for "Прочее")"""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        best = out[0]
+        for ch in activity.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node] < best:
+                best = out[node]
+                if best == 0:
+                    break
+        return best
+    
+    def classify(self, activity):
+        """(category, subcategory or None)"""
+        label = self.cache.get(activity)
+        if label is None:
+            label = self.cache[activity] = self.labels[self.match(activity)]
+        return label
+    
+    def __call__(self, activity):
+        return self.classify(activity)[0]
+
+
+def load_category_matcher(path=CATEGORIES_PATH, cache_path=None):
+    """
+    CategoryMatcher for categories.md, cached as JSON next to the tracking store.
+    The cache is keyed on the file's mtime/size, with a content hash as a
+    second check (e.g. after a git checkout), so repeat runs skip the parse.
+    """
+    cache_path = cache_path or store.get_cache_dir(config) / CATEGORIES_CACHE_FILENAME
+    try:
+        st = path.stat()
+    except OSError:
+        return CategoryMatcher({})
+    key = [st.st_mtime_ns, st.st_size]
+    
+    try:
+        cached = json.loads(cache_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        cached = {}
+    if cached.get('key') == key:
+        return CategoryMatcher.from_state(cached['matcher'])
     
-    # Group by category
-    by_category = defaultdict(lambda: {'count': 0, 'duration': 0, 'activities': []})
+    content = path.read_bytes()
+    digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+    if cached.get('hash') == digest:
+        matcher = CategoryMatcher.from_state(cached['matcher'])
+    else:
+        matcher = CategoryMatcher(parse_categories(content.decode('utf-8')))
+    
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix('.tmp')
+    tmp_path.write_text(
+        json.dumps({'key': key, 'hash': digest, 'matcher': matcher.to_state()}, ensure_ascii=False),
+        encoding='utf-8'
+    )
+    os.replace(tmp_path, cache_path)
+    return matcher
+
+
+def week_label(date_str):
+    """ISO week label for a YYYY-MM-DD date"""
+    year, week, _ = date.fromisoformat(date_str).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class DayCoverage:
+    """
+    Sweep over one day's intervals in start order: union of tracked time,
+    overlapping minutes and untracked gaps inside the tracking window.
+    Each interval is handled once, so a day costs O(entries).
+    """
+    
+    def __init__(self, window=TRACKING_WINDOW):
+        self.window_start, self.window_end = window
+        self.reach = None  # furthest end seen so far
+        self.tracked = 0
+        self.in_window = 0
+        self.overlap = 0
+        self.gaps = []
+    
+    def add(self, start, end):
+        reach = self.reach
+        if reach is not None and start < reach:
+            self.overlap += min(end, reach) - start
+        
+        gap_start = self.window_start if reach is None else max(reach, self.window_start)
+        if start > gap_start and gap_start < self.window_end:
+            self.gaps.append((gap_start, min(start, self.window_end)))
+        
+        new_start = start if reach is None else max(start, reach)
+        if end > new_start:
+            self.tracked += end - new_start
+            self.in_window += max(0, min(end, self.window_end) - max(new_start, self.window_start))
+            self.reach = end
+    
+    def finish(self):
+        """Per-day summary; the tail of the window after the last entry is a gap"""
+        gap_start = self.window_start if self.reach is None else max(self.reach, self.window_start)
+        if gap_start < self.window_end:
+            self.gaps.append((gap_start, self.window_end))
+        return {
+            'tracked': self.tracked,
+            'untracked': (self.window_end - self.window_start) - self.in_window,
+            'overlap': self.overlap,
+            'gaps': self.gaps,
+        }
+
+
+def aggregate(entries, categories, bucket=None, window=TRACKING_WINDOW):
+    """
+    One pass over an entry stream ordered by day and start time (as
+    load_entries yields it). Memory is bounded by the number of distinct
+    activities, days and buckets, not by the number of entries.
+    `categories` is a CategoryMatcher or a load_categories() dict.
+    """
+    by_category = defaultdict(lambda: {
+        'count': 0, 'duration': 0, 'activities': Counter(), 'subcategories': Counter(),
+        'buckets': defaultdict(int)
+    })
+    per_day = defaultdict(int)
+    bucket_keys = {}  # date -> bucket, computed once per day
+    coverage = {}  # date -> DayCoverage summary
+    sweep = sweep_date = None
+    total = {'count': 0, 'duration': 0}
+    matcher = categories if isinstance(categories, CategoryMatcher) else CategoryMatcher(categories)
     
     for entry in entries:
-        category = categorize_activity(entry['activity'], categories)
-        by_category[category]['count'] += 1
-        by_category[category]['duration'] += entry['duration_min']
-        by_category[category]['activities'].append(entry['activity'])
+        if entry['date'] != sweep_date:
+            if sweep:
+                coverage[sweep_date] = sweep.finish()
+            sweep, sweep_date = DayCoverage(window), entry['date']
+        sweep.add(entry['start_min'], entry['end_min'])
+        
+        category, subcategory = matcher.classify(entry['activity'])
+        data = by_category[category]
+        data['count'] += 1
+        data['duration'] += entry['duration_min']
+        data['activities'][entry['activity']] += 1
+        if subcategory:
+            data['subcategories'][subcategory] += entry['duration_min']
+        per_day[entry['date']] += 1
+        total['count'] += 1
+        total['duration'] += entry['duration_min']
+        
+        if bucket:
+            key = bucket_keys.get(entry['date'])
+            if key is None:
+                key = bucket_keys[entry['date']] = bucket(entry['date'])
+            data['buckets'][key] += entry['duration_min']
+    
+    if sweep:
+        coverage[sweep_date] = sweep.finish()
+    
+    total['per_day'] = per_day
+    total['coverage'] = coverage
+    total['buckets'] = sorted(set(bucket_keys.values()))
+    return by_category, total
+
+
+def generate_report(entries, categories, title="Недельная сводка Time Tracking",
+                    bucket=None, buckets=None, summary=None):
+    """
+    Generate grouped statistics (entries may be any iterable, consumed once).
+    With `bucket` (date -> label) a per-bucket comparison table is added,
+    columns are `buckets` or the labels seen in the data.
+    """
+    by_category, total = aggregate(entries, categories, bucket)
+    if summary is not None:
+        summary.update(total)
+    if not total['count']:
+        return "Нет данных за этот период."
     
     # Calculate totals
-    total_duration = sum(cat['duration'] for cat in by_category.values())
+    total_duration = total['duration']
     total_hours = total_duration / 60
     
     # Build report
-    report = f"# 📊 Недельная сводка Time Tracking\n\n"
-    report += f"**Всего отслежено:** {total_hours:.1f} часов ({len(entries)} записей)\n\n"
-    report += f"## Распределение по категориям\n\n"
+    report = f"# 📊 {title}\n\n"
+    report += f"**Всего отслежено:** {total_hours:.1f} часов ({total['count']} записей)\n\n"
+    report += format_coverage(total['coverage'])
     
     # Sort by duration desc
     sorted_categories = sorted(
@@ -135,6 +416,12 @@ def generate_report(entries, categories):
         reverse=True
     )
     
+    buckets = buckets or total['buckets']
+    if bucket and len(buckets) > 1:
+        report += format_comparison(sorted_categories, buckets)
+    
+    report += f"## Распределение по категориям\n\n"
+    
     for category, data in sorted_categories:
         hours = data['duration'] / 60
         percentage = (data['duration'] / total_duration * 100) if total_duration > 0 else 0
@@ -142,16 +429,13 @@ def generate_report(entries, categories):
         report += f"- **Время:** {hours:.1f}ч ({percentage:.1f}%)\n"
         report += f"- **Записей:** {data['count']}\n"
         
-        # Show top activities
-        activity_counts = defaultdict(int)
-        for act in data['activities']:
-            activity_counts[act] += 1
+        if data['subcategories']:
+            report += f"- **Подкатегории:**\n"
+            for subcategory, duration in data['subcategories'].most_common():
+                report += f"  - {subcategory}: {duration / 60:.1f}ч\n"
         
-        top_activities = sorted(
-            activity_counts.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:5]
+        # Show top activities
+        top_activities = data['activities'].most_common(5)
         
         if top_activities:
             report += f"- **Топ активностей:**\n"
@@ -163,34 +447,107 @@ def generate_report(entries, categories):
     return report
 
 
+def format_span(start, end):
+    return f"{store.format_minutes(start % store.DAY_MINUTES)}-{store.format_minutes(end % store.DAY_MINUTES)}"
+
+
+def format_coverage(coverage, max_days=31, max_gaps=3):
+    """Tracked vs untracked time in the tracking window for days with entries"""
+    tracked = sum(day['tracked'] for day in coverage.values())
+    untracked = sum(day['untracked'] for day in coverage.values())
+    overlap = sum(day['overlap'] for day in coverage.values())
+    window = TRACKING_WINDOW[1] - TRACKING_WINDOW[0]
+    percentage = (1 - untracked / (window * len(coverage))) * 100 if coverage else 0
+    
+    report = f"**Покрытие:** {percentage:.0f}% окна {format_span(*TRACKING_WINDOW)} "
+    report += f"(не отслежено {untracked / 60:.1f}ч за {len(coverage)} дн."
+    if overlap:
+        report += f", перекрытия {overlap / 60:.1f}ч"
+    report += ")\n\n"
+    
+    if len(coverage) > max_days:
+        return report
+    
+    report += "## Покрытие по дням\n\n"
+    report += "| День | Отслежено | Не отслежено | Перекрытия | Пропуски |\n"
+    report += "|---|---|---|---|---|\n"
+    for day, data in coverage.items():
+        gaps = ", ".join(format_span(*gap) for gap in data['gaps'][:max_gaps])
+        if len(data['gaps']) > max_gaps:
+            gaps += ", …"
+        report += (f"| {day} | {data['tracked'] / 60:.1f}ч | {data['untracked'] / 60:.1f}ч | "
+                   f"{data['overlap'] / 60:.1f}ч | {gaps or '—'} |\n")
+    
+    return report + "\n"
+
+
+def format_comparison(sorted_categories, buckets):
+    """Hours per category per bucket (week), with the change over the last bucket"""
+    report = "## Сравнение по неделям (часы)\n\n"
+    report += "| Категория | " + " | ".join(buckets) + " | Δ |\n"
+    report += "|---" * (len(buckets) + 2) + "|\n"
+    
+    for category, data in sorted_categories:
+        hours = [data['buckets'].get(key, 0) / 60 for key in buckets]
+        report += f"| {category} | " + " | ".join(f"{h:.1f}" for h in hours)
+        report += f" | {hours[-1] - hours[-2]:+.1f} |\n"
+    
+    return report + "\n"
+
+
 def main():
-    """Generate weekly report"""
-    print("Generating weekly time tracking report...\n")
+    """Generate time tracking report (current week by default)"""
+    parser = argparse.ArgumentParser(description='Time tracking report')
+    period = parser.add_mutually_exclusive_group()
+    period.add_argument('--month', help='Calendar month, YYYY-MM')
+    period.add_argument('--year', type=int, help='Calendar year')
+    period.add_argument('--weeks', type=int, default=1,
+                        help='Last N weeks with a per-week comparison')
+    parser.add_argument('--from', dest='date_from', help='Range start, YYYY-MM-DD')
+    parser.add_argument('--to', dest='date_to', help='Range end, YYYY-MM-DD (default today)')
+    parser.add_argument('--no-store', action='store_true',
+                        help='Parse diary files directly instead of the tracking store')
+    parser.add_argument('--rebuild-store', action='store_true',
+                        help='Re-ingest all diary files into the tracking store')
+    args = parser.parse_args()
     
-    # Load categories
-    categories = load_categories()
-    print(f"Loaded {len(categories)} categories")
+    if (args.date_from or args.date_to) and (args.month or args.year or args.weeks > 1):
+        parser.error('--from/--to cannot be combined with --month, --year or --weeks')
+    try:
+        start, end, title, slug = get_period(args)
+    except ValueError as e:
+        parser.error(str(e))
     
-    # Get week dates
-    week_dates = get_week_dates()
-    print(f"Week: {week_dates[0].strftime('%Y-%m-%d')} - {week_dates[-1].strftime('%Y-%m-%d')}\n")
+    print("Generating time tracking report...\n")
+    
+    # Load categories
+    categories = load_category_matcher()
+    print(f"Loaded {len(categories.names)} categories")
+    print(f"Period: {start} - {end}\n")
     
-    # Parse all diaries
-    all_entries = []
-    for date in week_dates:
-        entries = parse_diary(date)
-        all_entries.extend(entries)
-        if entries:
-            print(f"  {date.strftime('%a %Y-%m-%d')}: {len(entries)} entries")
+    # Entries are streamed from the store (synced with changed diary files first)
+    entries = load_entries(start, end, not args.no_store, args.rebuild_store)
+    bucket = buckets = None
+    if args.weeks > 1:
+        bucket = week_label
+        buckets = [week_label((start + timedelta(weeks=i)).isoformat()) for i in range(args.weeks)]
+    summary = {}
+    report = generate_report(entries, categories, title, bucket=bucket, buckets=buckets,
+                             summary=summary)
     
-    print(f"\nTotal entries: {len(all_entries)}\n")
+    if (end - start).days < 31:
+        for day in iter_dates(start, end):
+            count = summary['per_day'].get(day.isoformat())
+            if count:
+                print(f"  {day.strftime('%a %Y-%m-%d')}: {count} entries")
     
-    # Generate report
-    report = generate_report(all_entries, categories)
+    print(f"\nTotal entries: {summary['count']} over {len(summary['per_day'])} days\n")
     print(report)
     
     # Save to file
-    output_file = SKILL_DIR / f"weekly-report-{datetime.now().strftime('%Y-W%W')}.md"
+    prefix = "weekly-report" if (args.weeks == 1 and not (args.month or args.year or
+                                                             args.date_from or args.date_to)) else "report"
+    output_file = SKILL_DIR / f"{prefix}-{slug}.md"
     output_file.write_text(report)
     print(f"\n✅ Report saved: {output_file}")
 